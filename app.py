@@ -1,36 +1,127 @@
-from flask import Flask, render_template, request
-from src.search import hybrid_search
-from src.generator import generate_answer
-from src.config import INDEX_ALL
-from src.context_filter import build_filtered_context_highlights 
+import itertools
+import json
+import os
+import secrets
+import uuid
+from flask import Flask, Response, render_template, request, session, stream_with_context
+from src import pipeline, metrics
+from src.history import make_history_store
+from src.scheduler import Overloaded
+from src.config import FLASK_SECRET_KEY, HISTORY_PAGE_SIZE, WARM_UP_ON_START, TIMING_FOOTER
+
+
+def _secret_key():
+    """
+    FLASK_SECRET_KEY, or a random key for the single-process development server
+    (`python app.py`, FLASK_DEBUG=1); a worker started without it refuses to start.
+    """
+    if FLASK_SECRET_KEY:
+        return FLASK_SECRET_KEY
+    if __name__ == "__main__" or os.environ.get("FLASK_DEBUG") == "1":
+        print("FLASK_SECRET_KEY is not set: using a random key, sessions end when the process restarts")
+        return secrets.token_hex(32)
+    raise RuntimeError("FLASK_SECRET_KEY must be set (the same value for every worker); it signs the session cookies")
+
 
 app = Flask(__name__)
-chat_history = []  # each item will be: {"question": ..., "answer": ...}
+app.secret_key = _secret_key()
+history = make_history_store()  # per-session {"question": ..., "answer": ...} turns
+
+if WARM_UP_ON_START:
+    pipeline.warm_up()
+
+
+BUSY_MESSAGE = "Serverul este ocupat, încearcă din nou în câteva momente."
+_SERVER_ONLY = ("context", "sources")  # done-event fields for scripts (run_rag.py), not sent to browsers
+
+
+def session_id():
+    if "sid" not in session:
+        session["sid"] = uuid.uuid4().hex
+    return session["sid"]
+
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    global chat_history
+    sid = session_id()
+    error = None
 
     if request.method == "POST":
         if "clear" in request.form:
-            chat_history.clear()
+            history.clear(sid)
         else:
             query = request.form["question"]
             model = request.form.get("model", "gemma3:12b")
 
-            results = hybrid_search(query, index_name=INDEX_ALL, k=3)
-            context = build_filtered_context_highlights(results, query, top_n_sentences=7)
-            answer = generate_answer(query, context, model=model).strip()
+            try:
+                answer = pipeline.answer(query, model)
+                history.append(sid, query, answer)
+            except Overloaded:
+                error = BUSY_MESSAGE
             # print used model
             print(f"Used model: {model}")
 
-            chat_history.insert(0, {
-                "question": query,
-                "answer": answer
-            })
+    page = max(request.args.get("page", 1, type=int), 1)
+    entries, total = history.page(sid, page, HISTORY_PAGE_SIZE)
+    pages = max((total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
+    return render_template("index.html", history=entries, page=page, pages=pages, error=error), 503 if error else 200
+
+
+@app.route("/ask", methods=["POST"])
+def ask():
+    """Streams the answer as server-sent events: token events, then a final done event
+    (carrying the turn's stage timings when the timing footer is enabled)."""
+    sid = session_id()
+    query = request.form["question"]
+    model = request.form.get("model", "gemma3:12b")
+    print(f"Used model: {model}")
+    show_timings = TIMING_FOOTER
+
+    # Only admission is awaited before responding: the first event is the cached answer or
+    # the {"admitted"} marker, so an overloaded model still gets a proper status code while
+    # retrieval and the first LLM token are already streamed.
+    turn = pipeline.stream(query, model)
+    try:
+        first = [next(turn)]
+    except StopIteration:
+        first = []
+    except Overloaded:
+        return Response(json.dumps({"error": BUSY_MESSAGE}, ensure_ascii=False), status=503,
+                        mimetype="application/json", headers={"Retry-After": "5"})
+    except Exception as exc:
+        first = [{"error": str(exc)}]
+
+    def events():
+        try:
+            for event in itertools.chain(first, turn):
+                if event.get("admitted"):
+                    yield ": admitted\n\n"  # SSE comment: headers and first bytes go out now
+                    continue
+                if event.get("done"):
+                    history.append(sid, query, event["answer"])
+                    # events are shared with coalesced callers: copy rather than pop
+                    event = {key: value for key, value in event.items()
+                             if key not in _SERVER_ONLY and (show_timings or key != "timings")}
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as exc:
+            yield f"data: {json.dumps({'error': str(exc)}, ensure_ascii=False)}\n\n"
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # also runs when the client disconnects before events() starts: ends the subscription
+    # (and the turn itself, if nobody else shares it)
+    response.call_on_close(turn.close)
+    return response
+
 
-    return render_template("index.html", history=chat_history)
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint (stage latencies, ES took, LLM tokens, cache lookups)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,57 @@
+import asyncio
+import queue
+import threading
+
+# A single process-wide event loop running in a daemon thread. The Flask (WSGI)
+# views hand their coroutines to it, so all Elasticsearch and Ollama I/O of every
+# in-flight chat is multiplexed on one loop instead of blocking a worker each.
+_loop = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True).start()
+    return _loop
+
+
+def run(coro, timeout=None):
+    """Runs *coro* on the background loop and blocks the calling thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+_DONE = object()
+
+
+def iterate(agen):
+    """
+    Exposes an async generator running on the background loop as a plain generator.
+    A single task drains it (so context variables set inside it persist across items);
+    closing the plain generator early cancels that task.
+    """
+    items = queue.Queue()
+
+    async def drain():
+        try:
+            async for item in agen:
+                items.put((item, None))
+            items.put((_DONE, None))
+        except Exception as exc:
+            items.put((_DONE, exc))
+        finally:
+            await agen.aclose()
+
+    task = asyncio.run_coroutine_threadsafe(drain(), get_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        task.cancel()
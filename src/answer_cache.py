@@ -0,0 +1,114 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from src.metrics import cache_lookup
+from src.config import (
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SEMANTIC_THRESHOLD,
+    ANSWER_CACHE_VERSION_CHECK_SECONDS,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace."""
+    query = "".join(ch for ch in query.lower() if not unicodedata.category(ch).startswith("P"))
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class AnswerCache:
+    """
+    Query -> answer cache placed in front of the whole RAG pipeline.
+
+    Lookups first try an exact match on (normalized query, model); if `semantic_threshold`
+    is set, they then fall back to the cached query of the same model whose embedding has
+    the highest cosine similarity, provided it reaches the threshold.
+    Entries expire after `ttl` seconds, the least recently used are evicted beyond
+    `max_entries`, and everything is dropped when `version_fn()` (the physical index behind
+    the alias and its last incremental update, see `src.search.index_version`) changes.
+    """
+
+    def __init__(self, embed_fn=None, version_fn=None, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 ttl=ANSWER_CACHE_TTL_SECONDS, semantic_threshold=ANSWER_CACHE_SEMANTIC_THRESHOLD,
+                 version_check_interval=ANSWER_CACHE_VERSION_CHECK_SECONDS):
+        self.embed_fn = embed_fn  # list[str] -> normalized float32 matrix
+        self.version_fn = version_fn
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold if embed_fn else None
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()  # (normalized query, model) -> (created, answer, vector)
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self.hits_exact = self.hits_semantic = self.misses = self.invalidations = 0
+
+    def _check_version(self):
+        if self.version_fn is None or time.time() - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = time.time()
+        version = self.version_fn()
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._entries.clear()
+                self.invalidations += 1
+            self._version = version
+
+    def _vector(self, query):
+        # the raw query, so the vector is the one retrieval uses for the same turn
+        return self.embed_fn([query])[0] if self.semantic_threshold is not None else None
+
+    def get(self, query, model):
+        self._check_version()
+        key = (normalize_query(query), model)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits_exact += 1
+                cache_lookup("answer", "exact")
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        if self.semantic_threshold is None:
+            with self._lock:
+                self.misses += 1
+            cache_lookup("answer", "miss")
+            return None
+
+        vector = self._vector(query)
+        with self._lock:
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if k[1] == model and now - e[0] <= self.ttl]
+            if candidates:
+                sims = np.stack([e[2] for _, e in candidates]) @ vector
+                best = int(np.argmax(sims))
+                if sims[best] >= self.semantic_threshold:
+                    self._entries.move_to_end(candidates[best][0])
+                    self.hits_semantic += 1
+                    cache_lookup("answer", "semantic")
+                    return candidates[best][1][1]
+            self.misses += 1
+        cache_lookup("answer", "miss")
+        return None
+
+    def put(self, query, model, answer):
+        key = (normalize_query(query), model)
+        vector = self._vector(query)
+        with self._lock:
+            self._entries[key] = (time.time(), answer, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits_exact": self.hits_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
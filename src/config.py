@@ -1,8 +1,95 @@
+import os
+
 INDEX_AUTHORS = "intellit_authors_vec"
 INDEX_PUBLICATIONS = "intellit_publications_vec"
-INDEX_ALL = "intellit_all"
+INDEX_ALL = "intellit_all"  # alias pointing at the live versioned index (intellit_all_v<timestamp>)
 VECTOR_DIM = 384
+INDEX_SCHEMA_VERSION = 3  # bump when indexed fields change so incremental runs re-process every doc
 ES_HOST = "http://localhost:9200"
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-OLLAMA_HOST = "https://chat.readerbench.com/ollama"
-OLLAMA_AUTH_TOKEN = "your_ollama_auth_token_here"  # Replace with your actual token
\ No newline at end of file
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "https://chat.readerbench.com/ollama")  # e.g. a local tests/fake_ollama.py
+OLLAMA_AUTH_TOKEN = os.environ.get("OLLAMA_AUTH_TOKEN", "your_ollama_auth_token_here")  # Replace with your actual token
+INDEX_BATCH_SIZE = 256  # documents cleaned, embedded and sent to Elasticsearch per batch
+INDEX_BULK_CHUNK = 500  # actions per bulk request
+INDEX_BULK_THREADS = 2  # parallel_bulk workers
+INDEX_KEEP_VERSIONS = 2  # versioned indices kept after an alias swap (including the live one)
+INDEX_REPLICAS = 1  # replicas restored once a rebuilt index is loaded
+INDEX_REFRESH_INTERVAL = "1s"  # refresh interval restored once a rebuilt index is loaded
+EMBED_CACHE_PATH = ".cache/embeddings.sqlite"  # set to None to disable the persistent embedding cache
+EMBED_CACHE_MAX_ENTRIES = 500_000  # least recently used embeddings are evicted beyond this
+RETRIEVAL_MODE = "script_score"  # default hybrid_search mode: "script_score", "knn" or "rrf"
+KNN_NUM_CANDIDATES = 100  # HNSW candidates explored per shard in knn / rrf modes
+RRF_RANK_CONSTANT = 60  # k constant of reciprocal rank fusion
+RRF_WINDOW = 50  # hits fetched from each retriever before fusion
+HISTORY_BACKEND = "sqlite"  # "sqlite" (shared by all worker processes) or "memory" (per-process LRU)
+HISTORY_DB_PATH = ".cache/history.sqlite"
+HISTORY_MAX_TURNS = 50  # exchanges kept per session
+HISTORY_MAX_SESSIONS = 10_000  # sessions kept by the in-memory backend
+HISTORY_TTL_SECONDS = 7 * 24 * 3600  # idle sessions are forgotten after this
+HISTORY_PAGE_SIZE = 10
+FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")  # signs session cookies; required (and identical) for every worker process
+ANSWER_CACHE_MAX_ENTRIES = 2_000
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+ANSWER_CACHE_SEMANTIC_THRESHOLD = None  # e.g. 0.97: cosine between query embeddings; None = exact matches only
+# (MiniLM puts questions that differ only in the entity or verb above 0.95, so keep it off unless evaluated)
+ANSWER_CACHE_VERSION_CHECK_SECONDS = 30  # how often the index is checked for an alias swap or incremental update
+KEYWORDS_MODEL_PATH = ".cache/keywords.json"  # corpus document frequencies, reused by incremental runs
+KEYWORD_WORKERS = 4  # processes used for keyword extraction during full rebuilds (1 = in-process)
+EMBED_BATCH_SIZE = 64  # texts per forward pass
+EMBED_MAX_SEQ_LENGTH = None  # truncate inputs to this many tokens (None = model default)
+EMBED_WORKERS = 4  # processes used by embed_bulk during indexing (1 = in-process)
+EMBED_DEVICES = None  # e.g. ["cuda:0", "cuda:1"]; overrides EMBED_WORKERS when set
+WARM_UP_ON_START = os.environ.get("LITERARYBOT_WARM_UP", "0") == "1"  # load models when app.py is imported
+EMBED_BACKEND = "torch"  # "torch", "onnx" or "onnx-int8" (ONNX needs `pip install sentence-transformers[onnx]`)
+EMBED_ONNX_DIR = ".cache/onnx"  # where ONNX exports of MODEL_NAME are written
+EMBED_QUANTIZATION = "avx2"  # int8 quantization config: "arm64", "avx2", "avx512" or "avx512_vnni"
+VECTOR_INDEX_TYPE = "hnsw"  # "hnsw" (float32 graph) or "int8_hnsw" (scalar-quantized graph, ~4x less RAM)
+VECTOR_IN_SOURCE = True  # False drops `vector` from _source (doc values still serve kNN and script_score)
+VECTOR_REDUCED_DIM = None  # e.g. 128: fit PCA at index time and store reduced vectors
+REDUCTION_SAMPLE_SIZE = 20_000  # descriptions used to fit the PCA
+REDUCTION_DIR = ".cache/reduction"  # one <physical index>.npz reducer per reduced index
+MSEARCH_BATCH_SIZE = 100  # queries per _msearch request in hybrid_search_batch
+RERANK_ENABLED = False  # two-stage retrieval: over-fetch candidates, re-order them with a cross-encoder
+RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # multilingual (covers Romanian)
+RERANK_CANDIDATES = 30  # first-stage hits scored by the cross-encoder
+RERANK_BATCH_SIZE = 32  # (query, candidate) pairs per forward pass
+RERANK_MAX_LENGTH = 256  # tokens per pair; candidates are name + a short snippet
+RERANK_CACHE_SIZE = 20_000  # cached (query, doc id) scores
+RERANK_MS_PER_PAIR = 5.0  # initial cost estimate per pair, refined from measured batches
+RERANK_BUDGET_MS = 500  # per-turn deadline for retrieval + re-ranking; fewer candidates (or none) are scored when it is tight
+CONTEXT_TOKEN_BUDGETS = {  # tokens of retrieved context per model tag; prompt size drives latency on the Ollama host
+    "llama3.1:70b": 1500,
+    "llama3.3:latest": 1500,
+    "deepseek-r1:70b": 1000,  # leaves room for the reasoning trace
+    "qwen2.5:72b": 1500,
+    "llama4:16x17b": 2000,
+    "gemma3:12b": 1200,  # the form's default model and FALLBACK_MODEL
+}
+CONTEXT_DEFAULT_TOKEN_BUDGET = 1200  # models missing from CONTEXT_TOKEN_BUDGETS
+CHARS_PER_TOKEN = 3.5  # rough average for Romanian text with Llama/Qwen tokenizers
+CONTEXT_HIGHLIGHT_BOOST = 0.2  # added to a sentence's cosine score when it lies entirely inside an ES highlight
+CONTEXT_DEDUP_THRESHOLD = 0.95  # sentences this similar to one already packed are skipped
+CONTEXT_MAX_EMBED_SENTENCES = 12  # per doc without indexed sentence vectors: highlighted sentences plus this many, by query-word overlap, are embedded
+TIMING_FOOTER = os.environ.get("LITERARYBOT_TIMING_FOOTER", "0") == "1"  # per-answer stage timings in the UI (internal detail: keep off for public deployments)
+OLLAMA_CONNECT_TIMEOUT = 5.0  # seconds to open a connection (or wait for a pooled one)
+OLLAMA_READ_TIMEOUT = 60.0  # seconds without a streamed chunk (covers model load + prompt eval); then FALLBACK_MODEL
+OLLAMA_MAX_CONNECTIONS = 32  # pooled connections per client
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 16  # idle connections kept open for reuse
+OLLAMA_KEEP_ALIVE = "30m"  # how long the host keeps a model loaded after each request (pinned models: OLLAMA_PIN_KEEP_ALIVE)
+OLLAMA_PINNED_MODELS = None  # models kept loaded by pin_models(); None = the options of templates/index.html
+OLLAMA_PIN_KEEP_ALIVE = "24h"
+OLLAMA_RETRIES = 2  # extra attempts on connection errors and 429/5xx, only before the first token
+OLLAMA_RETRY_BACKOFF = 0.5  # seconds; attempt n sleeps uniform(0, backoff * 2**n) ("full jitter")
+LLM_LATENCY_BUDGET_SECONDS = 90  # per model: seconds to the first token, retries included; then FALLBACK_MODEL
+FALLBACK_MODEL = "gemma3:12b"  # smaller model used after a timeout or exhausted retries; None disables
+MODEL_OPTIONS = {  # Ollama generation options per model tag; "default" applies to the others
+    "default": {"num_ctx": 4096, "num_predict": 256},
+    "deepseek-r1:70b": {"num_ctx": 8192, "num_predict": 1024},  # reasoning trace before the answer
+    "llama4:16x17b": {"num_ctx": 8192, "num_predict": 256},
+}
+MODEL_CONCURRENCY = {  # chat turns generating at once per model tag; "default" applies to the others
+    "default": 2,
+    "gemma3:12b": 4,
+}
+SCHEDULER_MAX_QUEUE = 16  # turns waiting per model before new ones are rejected with 503
+EMBED_QUERY_LRU_SIZE = 4096  # query vectors kept in memory, shared by the answer cache and retrieval of a turn
@@ -1,90 +1,106 @@
+import math
 import re
-from sentence_transformers import util
-from src.embedder import embed
-
-# ---------------------------------------------------------------------------
-#  Abbreviation‑aware sentence tokenizer (Romanian)
-# ---------------------------------------------------------------------------
-
-_ABBREVIATIONS = {
-    # administrativ / tehnic
-    "j.", "jud.", "nr.", "vol.", "cap.", "fig.", "art.", "pag.", "sec.", "cca.",
-    "str.", "bl.", "sc.", "ap.", "mun.", "com.", "loc.", "nrcrt.", "crt.",
-    # formule de adresare & titluri
-    "d.", "dl.", "dna.", "dvs.", "dv.", "dom.", "dr.", "prof.", "ing.", "conf.",
-    "lect.", "acad.", "col.", "lt.", "cpt.", "mr.", "gen.",
-    # altele frecvente
-    "etc.", "cf.", "op.cit.", "ibid.", "n.b.", "p.s.",
-    # prenume abreviate uzuale
-    "Al.", "Gh.", "I.", "Ion.", "Gr.", "V.", "M.", "O.", "G.", "E.", "Șt.", "T.",
-    # expresii
-    "a.c.", "l.c.", "d.e.", "de ex.", "p.a.", "î.e.n.", "e.n.",
-    # enumerate
-    "ș.a.", "ș.a.m.d.",
-}
-
-_INITIAL_REGEX = re.compile(r"^[A-ZȘȚĂÂÎ]\.?")          # O.
-_TWO_LETTER_REGEX = re.compile(r"^[A-ZȘȚĂÂÎ][a-zăâîșț]\.?")  # Al.
-
-
-def _is_bad_break(token: str) -> bool:
-    token = token.strip()
-    if any(token.endswith(abbr) for abbr in _ABBREVIATIONS):
-        return True
-    if _INITIAL_REGEX.fullmatch(token):
-        return True
-    if _TWO_LETTER_REGEX.fullmatch(token):
-        return True
-    if re.fullmatch(r"(?:[A-Z]\\.){2,}[A-Z]?", token):  # C.F.R.
-        return True
-    return False
-
-
-def sent_tokenize(text: str) -> list[str]:
-    """Sentence tokenizer that avoids splitting after common Romanian abbreviations."""
-    if not text:
-        return []
-
-    chunks = re.split(r"(?<=[.!?]) +", text.strip())
-    sentences, i = [], 0
-    while i < len(chunks):
-        cur = chunks[i]
-        while _is_bad_break(cur) and i + 1 < len(chunks):
-            i += 1
-            cur += " " + chunks[i]
-        sentences.append(cur.strip())
-        i += 1
-    return sentences
+import numpy as np
+from src.embedder import embed_array
+from src.metrics import timed
+from src.sentences import sent_tokenize
+from src.utils import unpack_vectors
+from src.config import (
+    VECTOR_DIM, CONTEXT_TOKEN_BUDGETS, CONTEXT_DEFAULT_TOKEN_BUDGET, CHARS_PER_TOKEN,
+    CONTEXT_HIGHLIGHT_BOOST, CONTEXT_DEDUP_THRESHOLD, CONTEXT_MAX_EMBED_SENTENCES,
+)
 
 # ---------------------------------------------------------------------------
 #  Sentence relevance scoring
 # ---------------------------------------------------------------------------
 
-def extract_top_sentences_anchored(text: str, query: str, anchor: str, top_n: int = 5) -> list[str]:
-    if not text.strip():
-        return []
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the *n* highest scores, best first (argpartition, no full sort)."""
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    if n < len(scores):
+        idx = np.sort(np.argpartition(-scores, n - 1)[:n])
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
 
-    sents = sent_tokenize(text)
-    if not sents:
-        return []
 
-    full_q = f"{query} {anchor}"
-    q_emb = embed([full_q])[0]
-    s_embs = embed(sents)
+def score_sentences(results: list[dict], query: str, tokenize=sent_tokenize, select=None):
+    """Sentences of every result with their vectors and their similarity to "query name".
 
-    scores = [util.cos_sim(q_emb, e)[0][0].item() for e in s_embs]
-    ranked = sorted(zip(sents, scores), key=lambda x: x[1], reverse=True)
-    return [s for s, _ in ranked[:top_n]]
+    All anchors and all sentences lacking the indexer's precomputed vectors are
+    embedded in one model call; each document is then scored with a single
+    matrix-vector product. `select(result, sentences)` may narrow the sentences of a
+    document that has to be embedded. Returns one (sentences, vectors, scores) per result.
+    """
+    sents_per_doc, matrices, pending = [], [None] * len(results), []
+    for i, res in enumerate(results):
+        text = res.get("description", "")
+        if not text.strip():
+            sents = []
+        elif res.get("sentences") and res.get("sentence_vectors"):
+            sents = res["sentences"]
+            matrices[i] = unpack_vectors(res["sentence_vectors"], VECTOR_DIM)
+        else:
+            sents = tokenize(text)
+            if select is not None:
+                sents = select(res, sents)
+            pending.append(i)
+        sents_per_doc.append(sents)
+
+    scored = [([], None, np.empty(0, dtype=np.float32)) for _ in results]
+    active = [i for i, sents in enumerate(sents_per_doc) if sents]
+    if not active:
+        return scored
+
+    # anchors and sentences without precomputed vectors share one model call
+    anchors = [f"{query} {results[i]['name']}" for i in active]
+    missing = [s for i in pending for s in sents_per_doc[i]]
+    with timed("sentence_embed"):
+        embs = embed_array(anchors + missing)
+    q_embs, s_embs = embs[:len(anchors)], embs[len(anchors):]
+    if missing:
+        offset = 0
+        for i in pending:
+            matrices[i] = s_embs[offset:offset + len(sents_per_doc[i])]
+            offset += len(sents_per_doc[i])
+
+    for q_emb, i in zip(q_embs, active):
+        scored[i] = (sents_per_doc[i], matrices[i], matrices[i] @ q_emb)
+    return scored
+
+
+def select_top_sentences(results: list[dict], query: str, top_n: int = 5,
+                         tokenize=sent_tokenize) -> list[list[str]]:
+    """Top-*n* sentences of every result, ranked against "query name" (see `score_sentences`)."""
+    return [[sents[j] for j in top_n_indices(scores, top_n)]
+            for sents, _, scores in score_sentences(results, query, tokenize)]
+
+
+def extract_top_sentences_anchored(text: str, query: str, anchor: str, top_n: int = 5,
+                                   sentences: list[str] | None = None,
+                                   sentence_vectors: str | None = None) -> list[str]:
+    """Ranks the sentences of *text* by similarity to "query anchor".
+    When the indexer's precomputed `sentences` / packed `sentence_vectors` are given,
+    only the query is embedded and scoring is a single dot product.
+    """
+    doc = {"name": anchor, "description": text,
+           "sentences": sentences, "sentence_vectors": sentence_vectors}
+    return select_top_sentences([doc], query, top_n)[0]
 
 # ---------------------------------------------------------------------------
 #  Context builder (prefers ES highlights)
 # ---------------------------------------------------------------------------
 
+@timed("context")
 def build_filtered_context_highlights(results: list[dict], query: str, top_n_sentences: int = 5) -> str:
     """Builds compressed LLM context. Order of preference per document:
     1. Elasticsearch highlight fragments (if any)
-    2. Top-N semantically ranked sentences.
+    2. Top-N semantically ranked sentences (scored for all such documents in one batch).
     """
+    fallback = [res for res in results if not res.get("highlight")]
+    top_sents = dict(zip(map(id, fallback), select_top_sentences(fallback, query, top_n_sentences)))
+
     parts = []
     for res in results:
         name = res["name"]
@@ -92,12 +108,107 @@ def build_filtered_context_highlights(results: list[dict], query: str, top_n_sen
         if hl:
             snippet = " ".join(hl)
         else:
-            snippet = " ".join(
-                extract_top_sentences_anchored(res["description"], query, name, top_n_sentences)
-            )
+            snippet = " ".join(top_sents[id(res)])
         parts.append(f"{name}: {snippet}")
     return "\n\n".join(parts)
 
+# ---------------------------------------------------------------------------
+#  Token-budget context packing
+# ---------------------------------------------------------------------------
+
+_WORD_REGEX = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round-trip); calibrated by CHARS_PER_TOKEN."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def context_budget(model: str) -> int:
+    return CONTEXT_TOKEN_BUDGETS.get(model, CONTEXT_DEFAULT_TOKEN_BUDGET)
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_REGEX.findall(text.lower())
+
+
+def _highlight_words(res: dict) -> set:
+    return set(_words(" ".join(res.get("highlight") or [])))
+
+
+def _highlight_overlap(sentence: str, highlight_words: set) -> float:
+    """Share of the sentence's words that appear in the document's highlight fragments."""
+    words = _words(sentence)
+    return sum(w in highlight_words for w in words) / len(words) if words else 0.0
+
+
+def _embedding_candidates(query: str, limit: int = CONTEXT_MAX_EMBED_SENTENCES):
+    """
+    `select` for `score_sentences`: keeps the sentences that overlap the highlight fragments
+    plus the *limit* sharing the most words with the query (earlier first on ties), in text order.
+    """
+    query_words = set(_words(query))
+
+    def select(res: dict, sents: list[str]) -> list[str]:
+        if len(sents) <= limit:
+            return sents
+        highlight_words = _highlight_words(res)
+        keep = {j for j, s in enumerate(sents) if highlight_words and _highlight_overlap(s, highlight_words) > 0}
+        overlap = [len(query_words.intersection(_words(s))) for s in sents]
+        keep.update(sorted(range(len(sents)), key=lambda j: (-overlap[j], j))[:limit])
+        return [sents[j] for j in sorted(keep)]
+
+    return select
+
+
+@timed("context")
+def pack_context(results: list[dict], query: str, budget: int) -> tuple[str, int]:
+    """Builds LLM context that fits in *budget* tokens and returns it with its estimated size.
+
+    Every sentence of every retrieved document is a candidate (for documents without indexed
+    sentence vectors, only those picked by `_embedding_candidates` are embedded), scored by its
+    similarity to "query name" plus CONTEXT_HIGHLIGHT_BOOST times its overlap with the ES highlight
+    fragments. Candidates are taken best first across all documents, skipping repeated
+    sentences and those within CONTEXT_DEDUP_THRESHOLD cosine of one already taken, until
+    the budget is full. Documents keep their retrieval order and sentences their text order.
+    """
+    candidates = []  # (score, doc index, sentence index)
+    scored = score_sentences(results, query, select=_embedding_candidates(query))
+    for i, (res, (sents, _, scores)) in enumerate(zip(results, scored)):
+        highlight_words = _highlight_words(res)
+        for j, sentence in enumerate(sents):
+            boost = CONTEXT_HIGHLIGHT_BOOST * _highlight_overlap(sentence, highlight_words) if highlight_words else 0.0
+            candidates.append((float(scores[j]) + boost, i, j))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    chosen = {}  # doc index -> sentence indices
+    seen_texts = set()
+    dim = next((vectors.shape[1] for _, vectors, _ in scored if vectors is not None), VECTOR_DIM)
+    seen_vectors, n_seen = np.empty((len(candidates), dim), dtype=np.float32), 0  # filled prefix only
+    used = 0
+    for _, i, j in candidates:
+        sentence = scored[i][0][j]
+        key = " ".join(_words(sentence))
+        if key in seen_texts:
+            continue
+        vector = scored[i][1][j]
+        if n_seen and float(np.max(seen_vectors[:n_seen] @ vector)) >= CONTEXT_DEDUP_THRESHOLD:
+            continue
+        # a document's first sentence also pays for its "name: " header and the blank line
+        cost = estimate_tokens(sentence) + (estimate_tokens(f"{results[i]['name']}: \n\n") if i not in chosen else 0)
+        if used + cost > budget:
+            continue
+        used += cost
+        chosen.setdefault(i, []).append(j)
+        seen_texts.add(key)
+        seen_vectors[n_seen] = vector
+        n_seen += 1
+
+    parts = [f"{results[i]['name']}: " + " ".join(scored[i][0][j] for j in sorted(chosen[i]))
+             for i in sorted(chosen)]
+    context = "\n\n".join(parts)
+    return context, estimate_tokens(context)
+
 # ---------------------------------------------------------------------------
 #  Quick manual test
 # ---------------------------------------------------------------------------
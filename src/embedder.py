@@ -1,7 +1,163 @@
-from sentence_transformers import SentenceTransformer
-from src.config import MODEL_NAME
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.config import (
+    MODEL_NAME, VECTOR_DIM, EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES,
+    EMBED_BATCH_SIZE, EMBED_MAX_SEQ_LENGTH, EMBED_WORKERS, EMBED_DEVICES,
+    EMBED_BACKEND, EMBED_ONNX_DIR, EMBED_QUANTIZATION, EMBED_QUERY_LRU_SIZE,
+)
+from src.embedding_cache import EmbeddingCache, text_key
+from src.metrics import timed, cache_lookup
 
-model = SentenceTransformer(MODEL_NAME)
+# "torch": reference float32 PyTorch model
+# "onnx": ONNX Runtime export of the same weights
+# "onnx-int8": ONNX export with int8 dynamic quantization (CPU only)
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Vectors from different backends are close but not identical, so they are cached separately
+CACHE_NAMESPACE = MODEL_NAME if EMBED_BACKEND == "torch" else f"{MODEL_NAME}@{EMBED_BACKEND}"
+
+_model = None  # process-wide SentenceTransformer, loaded on first use
+_model_lock = threading.Lock()
+cache = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_ENTRIES) if EMBED_CACHE_PATH else None
+_pool = None  # multi-process pool used by embed_bulk, started on first use
+_query_vectors = OrderedDict()  # query text -> float32 vector, LRU of EMBED_QUERY_LRU_SIZE
+_query_lock = threading.Lock()
+
+def load_model(backend=EMBED_BACKEND):
+    """
+    Loads MODEL_NAME with the given backend. ONNX exports are written once to
+    EMBED_ONNX_DIR and reloaded from there on later starts.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        model = SentenceTransformer(MODEL_NAME)
+    elif backend in ("onnx", "onnx-int8"):
+        export_dir = os.path.join(EMBED_ONNX_DIR, MODEL_NAME.replace("/", "__"))
+        if not os.path.exists(os.path.join(export_dir, "onnx", "model.onnx")):
+            SentenceTransformer(MODEL_NAME, backend="onnx").save_pretrained(export_dir)
+        file_name = "model.onnx"
+        if backend == "onnx-int8":
+            file_name = f"model_qint8_{EMBED_QUANTIZATION}.onnx"
+            if not os.path.exists(os.path.join(export_dir, "onnx", file_name)):
+                from sentence_transformers import export_dynamic_quantized_onnx_model
+                # the default suffix is "<weights dtype>_<config>" (e.g. quint8_avx2), so pin it
+                export_dynamic_quantized_onnx_model(
+                    SentenceTransformer(export_dir, backend="onnx"), EMBED_QUANTIZATION, export_dir,
+                    file_suffix=f"qint8_{EMBED_QUANTIZATION}",
+                )
+        model = SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"})
+    else:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {EMBED_BACKENDS}")
+
+    if EMBED_MAX_SEQ_LENGTH:
+        model.max_seq_length = EMBED_MAX_SEQ_LENGTH
+    return model
+
+def get_model():
+    """Returns the shared embedding model (EMBED_BACKEND), importing and loading it on first call."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+def warm_up():
+    """Loads the model and runs one forward pass so the first request does not pay for it."""
+    get_model().encode(["warm-up"], show_progress_bar=False)
+
+def _model_encode(texts: list[str]) -> np.ndarray:
+    return get_model().encode(texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=False)
+
+def _pool_encode(texts: list[str]) -> np.ndarray:
+    global _pool
+    if _pool is None:
+        _pool = get_model().start_multi_process_pool(target_devices=EMBED_DEVICES or ["cpu"] * EMBED_WORKERS)
+    # Sort longest first (like SentenceTransformer.encode does) so every chunk holds texts of
+    # similar length and padding is minimal; chunks are whole batches so batch composition
+    # matches the single-process path.
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    workers = len(_pool["processes"])
+    batches_per_chunk = max(1, -(-len(texts) // (EMBED_BATCH_SIZE * workers)))
+    encoded = get_model().encode_multi_process(
+        [texts[i] for i in order], _pool,
+        batch_size=EMBED_BATCH_SIZE, chunk_size=EMBED_BATCH_SIZE * batches_per_chunk,
+    )
+    result = np.empty_like(encoded)
+    result[order] = encoded
+    return result
+
+def stop_bulk_pool():
+    global _pool
+    if _pool is not None:
+        get_model().stop_multi_process_pool(_pool)
+        _pool = None
+
+@timed("embed")
+def _encode(texts: list[str], encoder=_model_encode) -> np.ndarray:
+    """Returns a (len(texts), dim) float32 matrix, going through the embedding cache if enabled."""
+    if cache is None:
+        return np.asarray(encoder(texts), dtype=np.float32).reshape(len(texts), -1)
+
+    keys = [text_key(t) for t in texts]
+    vectors = cache.get_many(CACHE_NAMESPACE, list(set(keys)))
+
+    # Only the (deduplicated) cache misses go to the model, in a single batch
+    missing = {k: t for k, t in zip(keys, texts) if k not in vectors}
+    cache_lookup("embedding", "hit", len(keys) - len(missing))
+    cache_lookup("embedding", "miss", len(missing))
+    if missing:
+        encoded = encoder(list(missing.values()))
+        new = list(zip(missing.keys(), np.asarray(encoded, dtype=np.float32)))
+        cache.put_many(CACHE_NAMESPACE, new)
+        vectors.update(new)
+
+    if not keys:
+        return np.empty((0, VECTOR_DIM), dtype=np.float32)
+    return np.stack([vectors[k] for k in keys])
 
 def embed(texts: list[str]) -> list[list[float]]:
-    return model.encode(texts, show_progress_bar=False).tolist()
+    return _encode(texts).tolist()
+
+def embed_array(texts: list[str]) -> np.ndarray:
+    """Like `embed` but returns L2-normalized float32 rows, so cosine similarity is a dot product."""
+    matrix = _encode(texts)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def embed_queries(texts: list[str], normalize: bool = False) -> np.ndarray:
+    """
+    Query vectors served from an in-memory LRU first, so the answer cache and retrieval of one
+    turn share a single encoding; the misses go through `_encode` in one call.
+    """
+    with _query_lock:
+        found = {t: _query_vectors[t] for t in texts if t in _query_vectors}
+        for t in found:
+            _query_vectors.move_to_end(t)
+    missing = list(dict.fromkeys(t for t in texts if t not in found))
+    cache_lookup("query_vector", "hit", len(texts) - len(missing))
+    cache_lookup("query_vector", "miss", len(missing))
+    if missing:
+        encoded = dict(zip(missing, _encode(missing)))
+        found.update(encoded)
+        with _query_lock:
+            _query_vectors.update(encoded)
+            while len(_query_vectors) > EMBED_QUERY_LRU_SIZE:
+                _query_vectors.popitem(last=False)
+    if not texts:
+        return np.empty((0, VECTOR_DIM), dtype=np.float32)
+    matrix = np.stack([found[t] for t in texts])
+    if normalize:
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix
+
+def embed_bulk(texts: list[str]) -> list[list[float]]:
+    """
+    `embed` for bulk indexing: cache misses are spread over EMBED_WORKERS processes
+    (or EMBED_DEVICES). Output order matches the input order and the single-process path.
+    """
+    if not texts or (EMBED_WORKERS <= 1 and not EMBED_DEVICES):
+        return embed(texts)
+    return _encode(texts, encoder=_pool_encode).tolist()
@@ -1,16 +1,88 @@
-import ollama
-from src.config import OLLAMA_HOST, OLLAMA_AUTH_TOKEN
-
-client = ollama.Client(
-    host=OLLAMA_HOST,
-    headers={"Authorization": f"Bearer {OLLAMA_AUTH_TOKEN}"}
+import asyncio
+import functools
+import os
+import random
+import re
+import threading
+import time
+from src.config import (
+    OLLAMA_HOST, OLLAMA_AUTH_TOKEN, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS, OLLAMA_KEEP_ALIVE, OLLAMA_PINNED_MODELS, OLLAMA_PIN_KEEP_ALIVE,
+    OLLAMA_RETRIES, OLLAMA_RETRY_BACKOFF, LLM_LATENCY_BUDGET_SECONDS, FALLBACK_MODEL, MODEL_OPTIONS,
 )
+from src.metrics import timed, observe_stage, observe_llm_tokens, LLM_EVENTS
+
+_clients = {}  # process-wide Ollama clients (each with its own pooled httpx client), created on first use
+_clients_lock = threading.Lock()
+
+_TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "index.html")
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_pinned = set()  # models loaded by pin_models(), whose residency later calls must not shorten
+
+def _get_client(kind):
+    if kind not in _clients:
+        with _clients_lock:
+            if kind not in _clients:
+                import httpx
+                import ollama
+                cls = ollama.AsyncClient if kind == "async" else ollama.Client
+                _clients[kind] = cls(
+                    host=OLLAMA_HOST,
+                    headers={"Authorization": f"Bearer {OLLAMA_AUTH_TOKEN}"},
+                    # streamed responses: the read timeout bounds the wait for every chunk, the first included
+                    timeout=httpx.Timeout(OLLAMA_READ_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT,
+                                          pool=OLLAMA_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                        max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS),
+                )
+    return _clients[kind]
+
+def get_client():
+    return _get_client("sync")
+
+def get_async_client():
+    return _get_client("async")
+
+def model_options(model):
+    return MODEL_OPTIONS.get(model, MODEL_OPTIONS["default"])
+
+@functools.lru_cache(maxsize=1)
+def _hot_models():
+    if OLLAMA_PINNED_MODELS is not None:
+        return tuple(OLLAMA_PINNED_MODELS)
+    with open(_TEMPLATE, encoding="utf-8") as f:
+        select = re.search(r'<select[^>]*id="model-select".*?</select>', f.read(), re.S)
+    return tuple(re.findall(r'<option value="([^"]+)"', select.group(0))) if select else ()
 
-def generate_answer(query, context, model="llama3.3:latest"):
+def hot_models():
+    """Models offered by the UI model selector (templates/index.html), or OLLAMA_PINNED_MODELS when set."""
+    return list(_hot_models())
+
+def keep_alive(model):
     """
-    Generates an answer using a language model, given a question and the retrieved context.
+    Residency requested with every call: pinned (hot or explicitly pinned) models keep
+    OLLAMA_PIN_KEEP_ALIVE, since any request resets the host's unload timer to its own value.
+    """
+    return OLLAMA_PIN_KEEP_ALIVE if model in _pinned or model in _hot_models() else OLLAMA_KEEP_ALIVE
+
+def pin_models(models=None):
     """
-    prompt = (
+    Loads `models` (default: `hot_models()`) on the Ollama host and keeps them resident for
+    OLLAMA_PIN_KEEP_ALIVE, so chat turns do not pay for a cold load. Returns the models pinned.
+    """
+    pinned = []
+    for model in models if models is not None else hot_models():
+        try:
+            # an empty prompt only loads the model
+            get_client().generate(model=model, prompt="", keep_alive=OLLAMA_PIN_KEEP_ALIVE)
+            pinned.append(model)
+            _pinned.add(model)
+        except Exception as exc:
+            print(f"Could not pin {model}: {exc}")
+    return pinned
+
+def build_prompt(query, context):
+    return (
     f"Mai jos este un context extras dintr-o bază de date literară. "
     f"Folosește DOAR informațiile din acest context pentru a răspunde corect și complet la întrebare. "
     f"Răspunsul trebuie să fie concis, informativ și lung de 1-3 propoziții dacă nu este precizat altfel.\n\n"
@@ -20,5 +92,133 @@ def generate_answer(query, context, model="llama3.3:latest"):
     f"Răspuns:"
 )
 
-    response = client.generate(model=model, prompt=prompt)
-    return response["response"].strip()
+def _is_timeout(exc):
+    import httpx
+    # TimeoutError: LLM_LATENCY_BUDGET_SECONDS ran out before the first token
+    return isinstance(exc, (httpx.TimeoutException, TimeoutError, asyncio.TimeoutError))
+
+def _is_retryable(exc):
+    import httpx
+    import ollama
+    if isinstance(exc, ollama.ResponseError):
+        return exc.status_code in _RETRYABLE_STATUS
+    # timeouts are TransportErrors too, but waiting again on a cold or hung model is pointless
+    return isinstance(exc, (ConnectionError, httpx.TransportError)) and not _is_timeout(exc)
+
+class _Attempts:
+    """
+    Retry and fallback decisions shared by the sync and async generation paths.
+    Connection errors and 429/5xx are retried with full-jitter backoff; a timeout (cold model
+    load, hung host), exhausted retries or an exceeded LLM_LATENCY_BUDGET_SECONDS switch to
+    FALLBACK_MODEL. Only failures before the first token are recovered from.
+    The budget runs per model, from its first attempt to its first token (see `remaining`).
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.attempt = 0
+        self.started = time.monotonic()
+
+    def remaining(self):
+        """Seconds left for the current model to produce its first token."""
+        return LLM_LATENCY_BUDGET_SECONDS - (time.monotonic() - self.started)
+
+    def check_budget(self):
+        if self.remaining() <= 0:
+            raise TimeoutError(f"{self.model}: no token within {LLM_LATENCY_BUDGET_SECONDS}s")
+
+    def after_failure(self, exc):
+        """Returns the delay before the next attempt (for `self.model`), or re-raises *exc*."""
+        retryable = _is_retryable(exc)
+        over_budget = time.monotonic() - self.started > LLM_LATENCY_BUDGET_SECONDS
+        if retryable and not over_budget and self.attempt < OLLAMA_RETRIES:
+            self.attempt += 1
+            LLM_EVENTS.inc(model=self.model, event="retry")
+            return random.uniform(0, OLLAMA_RETRY_BACKOFF * 2 ** (self.attempt - 1))
+        if (retryable or _is_timeout(exc)) and FALLBACK_MODEL and self.model != FALLBACK_MODEL:
+            LLM_EVENTS.inc(model=self.model, event="timeout" if _is_timeout(exc) else "failure")
+            LLM_EVENTS.inc(model=FALLBACK_MODEL, event="fallback")
+            self.model, self.attempt, self.started = FALLBACK_MODEL, 0, time.monotonic()
+            return 0.0
+        raise exc
+
+    def request(self, prompt):
+        return dict(model=self.model, prompt=prompt, stream=True,
+                    options=model_options(self.model), keep_alive=keep_alive(self.model))
+
+def _stream_tokens(query, context, model, on_fallback=None):
+    prompt = build_prompt(query, context)
+    attempts = _Attempts(model)
+    while True:
+        start, first, stream = time.perf_counter(), True, None
+        try:
+            stream = get_client().generate(**attempts.request(prompt))
+            for part in stream:
+                if first and not part["response"]:
+                    # a blocking read cannot be cut short, so the budget is checked between
+                    # chunks (a stalled host is still bounded by OLLAMA_READ_TIMEOUT)
+                    attempts.check_budget()
+                if part["response"]:
+                    if first:
+                        observe_stage("first_token", time.perf_counter() - start)
+                        first = False
+                    yield part["response"]
+                if part.get("done"):
+                    observe_llm_tokens(attempts.model, part.get("prompt_eval_count"), part.get("eval_count"))
+            return
+        except Exception as exc:
+            if not first:
+                raise
+            if hasattr(stream, "close"):
+                stream.close()
+            delay = attempts.after_failure(exc)
+            if attempts.model != model and on_fallback is not None:
+                on_fallback(attempts.model)
+                on_fallback = None
+            time.sleep(delay)
+
+def generate_answer(query, context, model="llama3.3:latest", on_fallback=None):
+    """
+    Generates an answer using a language model, given a question and the retrieved context.
+    `on_fallback(fallback_model)` is called if generation switches to FALLBACK_MODEL, so the
+    caller knows which model actually answered.
+    """
+    with timed("generate"):
+        return "".join(_stream_tokens(query, context, model, on_fallback)).strip()
+
+async def stream_answer(query, context, model="llama3.3:latest", on_fallback=None):
+    """
+    Async variant of `generate_answer` that yields the answer token by token as Ollama produces it.
+    `on_fallback` is awaited here (so it may wait, e.g. for a slot of the fallback model).
+    """
+    prompt = build_prompt(query, context)
+    attempts = _Attempts(model)
+    with timed("generate"):
+        while True:
+            start, first = time.perf_counter(), True
+            try:
+                # until the first token every wait is bounded by the model's remaining budget
+                stream = await asyncio.wait_for(get_async_client().generate(**attempts.request(prompt)),
+                                                attempts.remaining())
+                while True:
+                    try:
+                        part = await (asyncio.wait_for(anext(stream), attempts.remaining()) if first
+                                      else anext(stream))
+                    except StopAsyncIteration:
+                        break
+                    if part["response"]:
+                        if first:
+                            observe_stage("first_token", time.perf_counter() - start)
+                            first = False
+                        yield part["response"]
+                    if part.get("done"):
+                        observe_llm_tokens(attempts.model, part.get("prompt_eval_count"), part.get("eval_count"))
+                return
+            except Exception as exc:
+                if not first:
+                    raise
+                delay = attempts.after_failure(exc)
+                if attempts.model != model and on_fallback is not None:
+                    await on_fallback(attempts.model)
+                    on_fallback = None
+                await asyncio.sleep(delay)
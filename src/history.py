@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from src.config import (
+    HISTORY_BACKEND, HISTORY_DB_PATH, HISTORY_MAX_TURNS, HISTORY_MAX_SESSIONS, HISTORY_TTL_SECONDS,
+)
+
+# ---------------------------------------------------------------------------
+#  Per-session conversation stores
+#  Both backends keep at most `max_turns` exchanges per session and return
+#  pages newest first: page(session_id, page, per_page) -> (entries, total).
+# ---------------------------------------------------------------------------
+
+
+class MemoryHistoryStore:
+    """In-process LRU of sessions with a TTL. Fast, but not shared between worker processes."""
+
+    def __init__(self, max_turns=HISTORY_MAX_TURNS, max_sessions=HISTORY_MAX_SESSIONS, ttl=HISTORY_TTL_SECONDS):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # session_id -> (last_access, deque of entries)
+        self._lock = threading.Lock()
+
+    def _get(self, session_id, create):
+        now = time.time()
+        item = self._sessions.get(session_id)
+        if item is not None and now - item[0] > self.ttl:
+            del self._sessions[session_id]
+            item = None
+        if item is None:
+            if not create:
+                return None
+            item = (now, deque(maxlen=self.max_turns))
+        self._sessions[session_id] = (now, item[1])
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return item[1]
+
+    def append(self, session_id, question, answer):
+        with self._lock:
+            self._get(session_id, create=True).append({"question": question, "answer": answer})
+
+    def page(self, session_id, page=1, per_page=10):
+        with self._lock:
+            turns = self._get(session_id, create=False)
+            if not turns:
+                return [], 0
+            newest_first = list(reversed(turns))
+        start = (page - 1) * per_page
+        return newest_first[start:start + per_page], len(newest_first)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteHistoryStore:
+    """On-disk store shared by every worker process that points at the same file."""
+
+    def __init__(self, path=HISTORY_DB_PATH, max_turns=HISTORY_MAX_TURNS, ttl=HISTORY_TTL_SECONDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+            " created REAL NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_created ON turns (created)")
+        self._conn.commit()
+
+    def append(self, session_id, question, answer):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO turns (session_id, created, question, answer) VALUES (?, ?, ?, ?)",
+                (session_id, now, question, answer),
+            )
+            # cap the session and drop expired turns of every session
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id = ? AND id NOT IN"
+                " (SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_turns),
+            )
+            self._conn.execute("DELETE FROM turns WHERE created < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def page(self, session_id, page=1, per_page=10):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM turns WHERE session_id = ? AND created >= ?", (session_id, cutoff)
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT question, answer FROM turns WHERE session_id = ? AND created >= ?"
+                " ORDER BY id DESC LIMIT ? OFFSET ?",
+                (session_id, cutoff, per_page, (page - 1) * per_page),
+            ).fetchall()
+        return [{"question": q, "answer": a} for q, a in rows], total
+
+    def clear(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+
+def make_history_store(backend=HISTORY_BACKEND):
+    if backend == "memory":
+        return MemoryHistoryStore()
+    if backend == "sqlite":
+        return SQLiteHistoryStore()
+    raise ValueError(f"Unknown history backend {backend!r}, expected 'memory' or 'sqlite'")
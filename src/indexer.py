@@ -1,14 +1,36 @@
-from src.utils import parse_bulk_json, clean_text, extract_keywords
-from src.embedder import embed
+import argparse
+import os
+import time
+from src.utils import iter_bulk_json, clean_text, content_hash, pack_vectors
+from src.keywords import KeywordExtractor, make_pool
+from src.reduction import PCAReducer, reducer_path, get_reducer
+from src.search import physical_index
+from src.embedder import embed, embed_bulk, stop_bulk_pool
+from src.sentences import sent_tokenize
 from elasticsearch import Elasticsearch, helpers
-from src.config import ES_HOST, VECTOR_DIM, INDEX_ALL
+from src.config import (
+    ES_HOST, VECTOR_DIM, INDEX_ALL, MODEL_NAME, INDEX_SCHEMA_VERSION,
+    INDEX_BATCH_SIZE, INDEX_BULK_CHUNK, INDEX_BULK_THREADS,
+    INDEX_KEEP_VERSIONS, INDEX_REPLICAS, INDEX_REFRESH_INTERVAL,
+    KEYWORDS_MODEL_PATH, KEYWORD_WORKERS,
+    VECTOR_INDEX_TYPE, VECTOR_IN_SOURCE, VECTOR_REDUCED_DIM, REDUCTION_SAMPLE_SIZE,
+)
 
 es = Elasticsearch(ES_HOST)
 
+def versioned_index_name(alias):
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
 def create_unified_index(name):
-    if es.indices.exists(index=name):
-        es.indices.delete(index=name)
+    """
+    Creates a physical index with bulk-load settings (no refresh, no replicas).
+    `finalize_index` restores the serving settings once loading is done.
+    """
     mapping = {
+        "settings": {
+            "number_of_replicas": 0,
+            "refresh_interval": "-1"
+        },
         "mappings": {
             "properties": {
                 "type": {"type": "keyword"},  # "author" or "publication"
@@ -17,61 +39,279 @@ def create_unified_index(name):
                 "professions": {"type": "text"},  # New field for authors
                 "writings": {"type": "text"},  # New field for authors
                 "category": {"type": "text"},  # New field for publications
+                "content_hash": {"type": "keyword", "index": False},  # Hash of the raw source doc
+                "sentences": {"type": "text", "index": False},  # Description split with sent_tokenize
+                # Normalized float32 vectors of `sentences`: a stored field kept out of _source,
+                # so search hits never carry it (see src.search.attach_sentences)
+                "sentence_vectors": {"type": "binary", "store": True},
                 "vector": {
                     "type": "dense_vector",
-                    "dims": VECTOR_DIM,
+                    "dims": VECTOR_REDUCED_DIM or VECTOR_DIM,
                     "index": True,
-                    "similarity": "cosine"
+                    "similarity": "cosine",
+                    "index_options": {"type": VECTOR_INDEX_TYPE}
                 }
             }
         }
     }
+    mapping["mappings"]["_source"] = {"excludes": ["sentence_vectors"] + ([] if VECTOR_IN_SOURCE else ["vector"])}
     es.indices.create(index=name, body=mapping)
 
-def index_unified_documents(authors_json, publications_json, index_name):
-    # Index authors
-    author_docs = parse_bulk_json(authors_json)
-    author_texts = [clean_text(doc, "description") for doc in author_docs]
-    author_vectors = embed(author_texts)
-    author_actions = []
-    for doc, vec, text in zip(author_docs, author_vectors, author_texts):
-        keywords = extract_keywords(text, language="romanian")  # Dynamically extract keywords
-        author_actions.append({
-            "_index": index_name,
-            "_id": f"author_{doc.get('search_name', doc.get('name'))}",
-            "_source": {
-                "type": "author",
-                "name": doc.get("name").replace(",", ""),  # Escape commas
-                "description": text,
-                "keywords": keywords,  # Add keywords field
-                "professions": doc.get("professions", []),
-                "writings": clean_text(doc, "writings"),
-                "vector": vec
-            }
-        })
-
-    # Index publications
-    publication_docs = parse_bulk_json(publications_json)
-    pub_texts = [clean_text(doc, "description") for doc in publication_docs]
-    pub_vectors = embed(pub_texts)
-    pub_actions = []
-    for doc, vec, text in zip(publication_docs, pub_vectors, pub_texts):
-        keywords = extract_keywords(text, language="romanian")  # Dynamically extract keywords
-        pub_actions.append({
-            "_index": index_name,
-            "_id": f"publication_{doc.get('name', doc.get('search_name'))}",
-            "_source": {
-                "type": "publication",
-                "name": doc.get("name"),
-                "description": text,
-                "keywords": keywords,  # Add keywords field
-                "category": clean_text(doc, "broad_category"),
-                "vector": vec
-            }
-        })
+def finalize_index(name):
+    """Restores serving settings, then refreshes and force-merges the freshly loaded index."""
+    es.indices.put_settings(index=name, settings={
+        "index": {"number_of_replicas": INDEX_REPLICAS, "refresh_interval": INDEX_REFRESH_INTERVAL}
+    })
+    es.indices.refresh(index=name)
+    es.indices.forcemerge(index=name, max_num_segments=1)
+    es.cluster.health(index=name, wait_for_status="yellow", timeout="60s")
+
+def swap_alias(alias, index_name):
+    """
+    Atomically points `alias` at `index_name`. A legacy concrete index that still
+    carries the alias name is dropped in the same request.
+    """
+    actions = [{"add": {"index": index_name, "alias": alias}}]
+    if es.indices.exists_alias(name=alias):
+        for old in es.indices.get_alias(name=alias):
+            actions.insert(0, {"remove": {"index": old, "alias": alias}})
+    elif es.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+    es.indices.update_aliases(actions=actions)
+
+def prune_old_versions(alias, keep=INDEX_KEEP_VERSIONS):
+    """Deletes all but the newest `keep` versioned indices; the live index is never deleted."""
+    live = set(es.indices.get_alias(name=alias)) if es.indices.exists_alias(name=alias) else set()
+    versions = sorted(es.indices.get(index=f"{alias}_v*"), reverse=True)
+    for name in versions[keep:]:
+        if name not in live:
+            es.indices.delete(index=name)
+            print(f"Deleted old index version {name}")
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _author_id(doc):
+    return f"author_{doc.get('search_name', doc.get('name'))}"
+
+def _author_source(doc, text, vec, keywords):
+    return {
+        "type": "author",
+        "name": doc.get("name").replace(",", ""),  # Escape commas
+        "description": text,
+        "keywords": keywords,
+        "professions": doc.get("professions", []),
+        "writings": clean_text(doc, "writings"),
+        "vector": vec
+    }
+
+def _publication_id(doc):
+    return f"publication_{doc.get('name', doc.get('search_name'))}"
+
+def _publication_source(doc, text, vec, keywords):
+    return {
+        "type": "publication",
+        "name": doc.get("name"),
+        "description": text,
+        "keywords": keywords,
+        "category": clean_text(doc, "broad_category"),
+        "vector": vec
+    }
+
+AUTHORS = (_author_id, _author_source)
+PUBLICATIONS = (_publication_id, _publication_source)
+
+def fetch_content_hashes(index_name):
+    """Returns {doc_id: content_hash} for every document currently in the index."""
+    hashes = {}
+    for hit in helpers.scan(es, index=index_name, query={"query": {"match_all": {}}}, _source=["content_hash"]):
+        hashes[hit["_id"]] = hit["_source"].get("content_hash")
+    return hashes
 
-    helpers.bulk(es, author_actions + pub_actions)
+def fit_keyword_extractor(paths, batch_size=INDEX_BATCH_SIZE):
+    """Streams every description once to collect corpus document frequencies."""
+    extractor = KeywordExtractor(language="romanian")
+    for path in paths:
+        for batch in _batched(iter_bulk_json(path), batch_size):
+            extractor.partial_fit([clean_text(doc, "description") for doc in batch])
+    print(f"Keyword model fitted on {extractor.n_docs} docs, {len(extractor.doc_freq)} terms")
+    return extractor
+
+def fit_reducer(paths, index_name, embed_fn=embed, sample_size=REDUCTION_SAMPLE_SIZE):
+    """Fits the PCA on the first `sample_size` descriptions and saves it for `index_name`."""
+    texts = []
+    for path in paths:
+        for doc in iter_bulk_json(path):
+            if len(texts) >= sample_size:
+                break
+            texts.append(clean_text(doc, "description"))
+    reducer = PCAReducer.fit(embed_fn(texts), VECTOR_REDUCED_DIM)
+    reducer.save(reducer_path(index_name))
+    print(f"PCA {VECTOR_DIM} -> {VECTOR_REDUCED_DIM} dims fitted on {len(texts)} docs")
+    return reducer
+
+def generate_actions(path, doc_kind, index_name, keywords, batch_size=INDEX_BATCH_SIZE,
+                     known_hashes=None, seen_ids=None, embed_fn=embed, reducer=None):
+    """
+    Lazily reads a bulk file and yields index actions.
+    Documents are cleaned, embedded and keyword-tagged one batch at a time,
+    so only `batch_size` documents are held in memory.
+    `keywords` maps a list of texts to their keyword lists; `embed_fn` embeds a list of texts.
+    With a `reducer` the document vectors are PCA-projected (sentence vectors keep full size).
+
+    With `known_hashes` (incremental mode) documents whose content hash is unchanged
+    are skipped before any cleaning or embedding. Every id read is added to `seen_ids`.
+    """
+    make_id, make_source = doc_kind
+    known_hashes = known_hashes or {}
+    for batch in _batched(iter_bulk_json(path), batch_size):
+        pending = []
+        for doc in batch:
+            doc_id, digest = make_id(doc), content_hash(doc, salt=f"{MODEL_NAME}|{INDEX_SCHEMA_VERSION}")
+            if seen_ids is not None:
+                seen_ids.add(doc_id)
+            if known_hashes.get(doc_id) != digest:
+                pending.append((doc_id, digest, doc))
+        if not pending:
+            continue
+
+        texts = [clean_text(doc, "description") for _, _, doc in pending]
+        vectors = embed_fn(texts)
+        if reducer is not None:
+            vectors = reducer.transform(vectors).tolist()
+
+        # Sentences of the whole batch are embedded in one call so context building
+        # at query time needs no sentence embedding at all
+        doc_sents = [sent_tokenize(text) for text in texts]
+        sent_vectors = embed_fn([s for sents in doc_sents for s in sents])
+
+        offset = 0
+        doc_keywords = keywords(texts)
+        for (doc_id, digest, doc), vec, text, sents, kws in zip(pending, vectors, texts, doc_sents, doc_keywords):
+            source = make_source(doc, text, vec, kws)
+            source["content_hash"] = digest
+            source["sentences"] = sents
+            if sents:
+                source["sentence_vectors"] = pack_vectors(sent_vectors[offset:offset + len(sents)])
+            offset += len(sents)
+            yield {"_index": index_name, "_id": doc_id, "_source": source}
+
+def bulk_index(actions, label, threads=INDEX_BULK_THREADS, report_every=INDEX_BATCH_SIZE):
+    """
+    Streams actions to Elasticsearch and prints progress and throughput
+    every `report_every` acknowledged documents. Returns the number indexed.
+    """
+    if threads > 1:
+        results = helpers.parallel_bulk(
+            es, actions, thread_count=threads, chunk_size=INDEX_BULK_CHUNK, queue_size=threads
+        )
+    else:
+        results = helpers.streaming_bulk(es, actions, chunk_size=INDEX_BULK_CHUNK)
+
+    start = last = time.perf_counter()
+    done = 0
+    for ok, info in results:
+        if not ok:
+            print(f"[{label}] failed: {info}")
+            continue
+        done += 1
+        if done % report_every == 0:
+            now = time.perf_counter()
+            print(f"[{label}] {done} docs indexed "
+                  f"({report_every / (now - last):.1f} docs/s batch, {done / (now - start):.1f} docs/s overall)")
+            last = now
+    elapsed = time.perf_counter() - start
+    print(f"[{label}] done: {done} docs in {elapsed:.1f}s")
+    return done
+
+def index_unified_documents(authors_json, publications_json, index_name, threads=INDEX_BULK_THREADS,
+                            keyword_workers=KEYWORD_WORKERS):
+    # Keyword IDF is fitted once over the whole corpus, then top terms are computed per batch
+    extractor = fit_keyword_extractor([authors_json, publications_json])
+    extractor.save(KEYWORDS_MODEL_PATH)
+    pool = make_pool(extractor, keyword_workers) if keyword_workers > 1 else None
+    keywords = lambda texts: extractor.top_terms_parallel(texts, pool)
+    try:
+        reducer = None
+        if VECTOR_REDUCED_DIM:
+            reducer = fit_reducer([authors_json, publications_json], index_name, embed_fn=embed_bulk)
+        bulk_index(generate_actions(authors_json, AUTHORS, index_name, keywords,
+                                    embed_fn=embed_bulk, reducer=reducer),
+                   "authors", threads)
+        bulk_index(generate_actions(publications_json, PUBLICATIONS, index_name, keywords,
+                                    embed_fn=embed_bulk, reducer=reducer),
+                   "publications", threads)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        stop_bulk_pool()
+
+def update_unified_documents(authors_json, publications_json, index_name, threads=INDEX_BULK_THREADS):
+    """
+    Incremental refresh: only new or changed documents are re-embedded and upserted,
+    and documents no longer present in the source files are deleted. The index's
+    `updated_at` _meta mark is then bumped so answer caches notice the change.
+    """
+    # Reuse the corpus statistics of the last full build, frozen: folding changed docs in
+    # would count them twice (their old terms cannot be subtracted) and never drop deleted
+    # ones, so the IDF would drift with every run. A full rebuild refits them.
+    if os.path.exists(KEYWORDS_MODEL_PATH):
+        extractor = KeywordExtractor.load(KEYWORDS_MODEL_PATH)
+    else:
+        extractor = fit_keyword_extractor([authors_json, publications_json])
+        extractor.save(KEYWORDS_MODEL_PATH)
+    keywords = extractor.top_terms
+    reducer = get_reducer(index_name, physical_index)  # keep the projection the live index was built with
+
+    known = fetch_content_hashes(index_name)
+    seen = set()
+    bulk_index(generate_actions(authors_json, AUTHORS, index_name, keywords,
+                                known_hashes=known, seen_ids=seen, reducer=reducer),
+               "authors", threads)
+    bulk_index(generate_actions(publications_json, PUBLICATIONS, index_name, keywords,
+                                known_hashes=known, seen_ids=seen, reducer=reducer),
+               "publications", threads)
+
+    stale = known.keys() - seen
+    deletions = ({"_op_type": "delete", "_index": index_name, "_id": doc_id} for doc_id in stale)
+    bulk_index(deletions, "deletions", threads=1)
+    es.indices.refresh(index=index_name)
+    # changes src.search.index_version, so answer caches keyed on it drop pre-update answers
+    es.indices.put_mapping(index=index_name, meta={"updated_at": time.strftime("%Y%m%d%H%M%S")})
+
+def rebuild_unified_index(authors_json, publications_json, alias, threads=INDEX_BULK_THREADS,
+                          keyword_workers=KEYWORD_WORKERS):
+    """
+    Zero-downtime rebuild: loads a new versioned index while `alias` keeps serving
+    the previous one, then swaps the alias and prunes old versions.
+    """
+    name = versioned_index_name(alias)
+    create_unified_index(name)
+    index_unified_documents(authors_json, publications_json, name, threads, keyword_workers)
+    finalize_index(name)
+    swap_alias(alias, name)
+    print(f"Alias {alias} -> {name}")
+    prune_old_versions(alias)
+    return name
 
 if __name__ == "__main__":
-    create_unified_index(INDEX_ALL)
-    index_unified_documents("data/authors_bulk.json", "data/publications_bulk.json", INDEX_ALL)
+    parser = argparse.ArgumentParser(description="Index authors and publications into Elasticsearch.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-index new/changed documents and delete removed ones")
+    parser.add_argument("--authors", default="data/authors_bulk.json")
+    parser.add_argument("--publications", default="data/publications_bulk.json")
+    parser.add_argument("--keyword-workers", type=int, default=KEYWORD_WORKERS,
+                        help="processes used for keyword extraction during full rebuilds")
+    args = parser.parse_args()
+
+    if args.incremental and es.indices.exists_alias(name=INDEX_ALL):
+        update_unified_documents(args.authors, args.publications, INDEX_ALL)
+    else:
+        rebuild_unified_index(args.authors, args.publications, INDEX_ALL, keyword_workers=args.keyword_workers)
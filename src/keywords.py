@@ -0,0 +1,112 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+from nltk.corpus import stopwords
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+@lru_cache(maxsize=None)
+def stopword_list(language="romanian"):
+    return tuple(stopwords.words(language))
+
+
+def num_keywords(text):
+    return max(10, len(text.split()) // 5)  # 1 keyword per 5 words, minimum 10
+
+
+class KeywordExtractor:
+    """
+    Corpus-level TF-IDF keyword engine.
+
+    Document frequencies are accumulated with `partial_fit` (streaming, only the
+    vocabulary is kept in memory); `top_terms` then scores each document's raw
+    term counts with the corpus IDF straight from the sparse count rows.
+    """
+
+    def __init__(self, language="romanian", doc_freq=None, n_docs=0):
+        self.language = language
+        self.doc_freq = Counter(doc_freq or {})
+        self.n_docs = n_docs
+        # Same tokenization as the previous per-document TfidfVectorizer
+        self._analyzer = CountVectorizer(stop_words=list(stopword_list(language))).build_analyzer()
+        self._vectorizer = None
+
+    def partial_fit(self, texts):
+        for text in texts:
+            self.doc_freq.update(set(self._analyzer(text)))
+            self.n_docs += 1
+        self._vectorizer = None
+        return self
+
+    def _prepare(self):
+        if self._vectorizer is None:
+            vocabulary = sorted(self.doc_freq)  # alphabetical, so index order breaks score ties
+            df = np.array([self.doc_freq[t] for t in vocabulary], dtype=np.float64)
+            self._terms = np.array(vocabulary, dtype=object)
+            self._idf = np.log((1 + self.n_docs) / (1 + df)) + 1  # smooth idf, as in sklearn
+            self._vectorizer = CountVectorizer(analyzer=self._analyzer,
+                                               vocabulary={t: i for i, t in enumerate(vocabulary)})
+
+    def top_terms(self, texts):
+        """Top `num_keywords(text)` terms of every text, best first."""
+        self._prepare()
+        if not len(self._terms):
+            return [[] for _ in texts]
+        counts = self._vectorizer.transform(texts).tocsr()
+        keywords = []
+        for row, text in enumerate(texts):
+            start, end = counts.indptr[row], counts.indptr[row + 1]
+            cols = counts.indices[start:end]
+            scores = counts.data[start:end] * self._idf[cols]
+            # a full sort, not argpartition: terms tied at the cutoff must also be taken in
+            # index (alphabetical) order, as the legacy stable sort did
+            order = np.lexsort((cols, -scores))[:num_keywords(text)]
+            keywords.append(self._terms[cols[order]].tolist())
+        return keywords
+
+    def top_terms_parallel(self, texts, pool=None, chunk_size=64):
+        """`top_terms` spread over a pool created with `make_pool(extractor)`."""
+        if pool is None or len(texts) <= chunk_size:
+            return self.top_terms(texts)
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        return [kw for part in pool.map(_worker_top_terms, chunks) for kw in part]
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"language": self.language, "n_docs": self.n_docs, "doc_freq": self.doc_freq}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return cls(state["language"], state["doc_freq"], state["n_docs"])
+
+
+# ---------------------------------------------------------------------------
+#  Process pool: every worker receives the fitted statistics once
+# ---------------------------------------------------------------------------
+
+_worker_extractor = None
+
+
+def _init_worker(language, doc_freq, n_docs):
+    global _worker_extractor
+    _worker_extractor = KeywordExtractor(language, doc_freq, n_docs)
+
+
+def _worker_top_terms(texts):
+    return _worker_extractor.top_terms(texts)
+
+
+def make_pool(extractor, workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(extractor.language, dict(extractor.doc_freq), extractor.n_docs),
+    )
@@ -0,0 +1,155 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ---------------------------------------------------------------------------
+#  In-process metrics, exported in the Prometheus text format by app.py (/metrics)
+#  Every observation is a perf_counter() pair, a bisect and a locked add, so the
+#  instrumentation stays on in production. Stages may nest (e.g. "embed" inside
+#  "query_embed" inside "search"); each is recorded under its own label.
+# ---------------------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+_registry = []
+
+
+def _escape(value):
+    """Label value escaping required by the text format: backslash, double quote, newline."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+STAGE_SECONDS = Histogram("literarybot_stage_seconds", "Wall time per pipeline stage.", ["stage"])
+ES_TOOK_SECONDS = Histogram("literarybot_es_took_seconds", "Server-side search time reported by Elasticsearch.")
+LLM_TOKENS = Histogram("literarybot_llm_tokens", "Prompt and response tokens reported by Ollama per call.",
+                       ["model", "kind"], buckets=TOKEN_BUCKETS)
+CACHE_LOOKUPS = Counter("literarybot_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
+LLM_EVENTS = Counter("literarybot_llm_events_total", "LLM retries, timeouts, failures and fallbacks.",
+                     ["model", "event"])
+SCHEDULER_EVENTS = Counter("literarybot_scheduler_events_total", "Coalesced and rejected chat turns.",
+                           ["model", "event"])
+TURNS = Counter("literarybot_turns_total", "Answered chat turns.", ["model", "cached"])
+
+# ---------------------------------------------------------------------------
+#  Per-request trace: a dict of summed stage timings and counts, carried by a
+#  context variable so asyncio tasks and asyncio.to_thread calls of the request
+#  all add to it.
+# ---------------------------------------------------------------------------
+
+_trace = ContextVar("literarybot_trace", default=None)
+
+
+def start_trace() -> dict:
+    trace = {}
+    _trace.set(trace)
+    return trace
+
+
+def _add(key, value):
+    trace = _trace.get()
+    if trace is not None:
+        trace[key] = trace.get(key, 0) + value
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    _add(f"{stage}_ms", seconds * 1000)
+
+
+@contextmanager
+def timed(stage):
+    """Records the wall time of the block (or decorated function) under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_es_took(took_ms):
+    ES_TOOK_SECONDS.observe(took_ms / 1000)
+    _add("es_took_ms", took_ms)
+
+
+def observe_llm_tokens(model, prompt_tokens, response_tokens):
+    for kind, count in (("prompt", prompt_tokens), ("response", response_tokens)):
+        if count is not None:
+            LLM_TOKENS.observe(count, model=model, kind=kind)
+            _add(f"{kind}_tokens", count)
+
+
+def cache_lookup(cache, result, count=1):
+    if count:
+        CACHE_LOOKUPS.inc(count, cache=cache, result=result)
@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import threading
+import time
+from src import aio
+from src.search import hybrid_search_async, attach_sentences_async, index_version
+from src.embedder import embed_queries, warm_up as warm_up_embedder
+from src.answer_cache import AnswerCache
+from src.context_filter import pack_context, context_budget
+from src.generator import stream_answer, pin_models
+from src.reranker import get_model as get_reranker
+from src.metrics import start_trace, TURNS
+from src.scheduler import Scheduler, INTERACTIVE, BATCH
+from src.config import INDEX_ALL, RERANK_ENABLED, RERANK_BUDGET_MS
+
+TOP_K_DOCS = 3
+
+# Shares the query-vector LRU with retrieval, so a turn encodes its query once
+answer_cache = AnswerCache(embed_fn=lambda texts: embed_queries(texts, normalize=True),
+                           version_fn=lambda: index_version(INDEX_ALL))
+
+
+def _rounded(trace):
+    return {key: round(value, 1) for key, value in trace.items()}
+
+
+def _fallback_admission(admit, slots, report):
+    """`on_fallback` for stream_answer: holds a slot of the fallback model (in `slots`) before it is used."""
+    async def on_fallback(fallback):
+        await slots.enter_async_context(admit(fallback))
+        report(fallback)
+    return on_fallback
+
+
+async def answer_events(query, model, admit=contextlib.nullcontext):
+    """
+    Full RAG turn as an async stream of events:
+    {"token": str} for every generated token, then
+    {"done": True, "answer": str, "cached": bool, "model": str, "context": str, "context_tokens": int,
+     "sources": list, "timings": dict}
+    where "model" is the model that answered (FALLBACK_MODEL after a fallback, see
+    src.generator; such answers are not cached), "context" is the packed context the model received, "sources" the retrieved
+    documents ({"type", "name", "score"}) and "timings" the turn's trace (stage milliseconds,
+    ES took, LLM token counts; see src.metrics). Cached answers carry no context or sources.
+    Retrieval and generation I/O is non-blocking; CPU-bound context packing (to the model's
+    token budget, see `context_budget`) runs in a thread.
+    Answers are served from `answer_cache` when the same (or a near-identical) question was
+    already answered by the same model against the current index.
+    With RERANK_ENABLED, retrieval and re-ranking share a RERANK_BUDGET_MS deadline.
+    Everything after the cache lookup runs inside `admit()` (a model slot from `scheduler`),
+    announced by an {"admitted": True} event; a fallback also takes a slot of the fallback
+    model, with `admit(fallback)`.
+    """
+    trace = start_trace()
+    cached = await asyncio.to_thread(answer_cache.get, query, model)
+    if cached is not None:
+        TURNS.inc(model=model, cached="true")
+        yield {"token": cached}
+        yield {"done": True, "answer": cached, "cached": True, "model": model, "context": "", "context_tokens": 0,
+               "sources": [], "timings": _rounded(trace)}
+        return
+
+    async with admit(), contextlib.AsyncExitStack() as fallback_slot:
+        yield {"admitted": True}
+        # the re-ranking budget starts now: time spent queued for a model slot must not use it up
+        deadline = time.monotonic() + RERANK_BUDGET_MS / 1000
+        results = await hybrid_search_async(query, index_name=INDEX_ALL, k=TOP_K_DOCS,
+                                            rerank=RERANK_ENABLED, deadline=deadline)
+        results = await attach_sentences_async(results, INDEX_ALL)
+        context, context_tokens = await asyncio.to_thread(pack_context, results, query, context_budget(model))
+
+        answered_by = [model]
+        on_fallback = _fallback_admission(admit, fallback_slot, answered_by.append)
+        parts = []
+        async for token in stream_answer(query, context, model=model, on_fallback=on_fallback):
+            parts.append(token)
+            yield {"token": token}
+    answer = "".join(parts).strip()
+    if answered_by[-1] == model:  # a fallback answer must not be served later as `model`'s
+        await asyncio.to_thread(answer_cache.put, query, model, answer)
+    TURNS.inc(model=answered_by[-1], cached="false")
+    sources = [{"type": r["type"], "name": r["name"], "score": r["score"]} for r in results]
+    yield {"done": True, "answer": answer, "cached": False, "model": answered_by[-1], "context": context,
+           "context_tokens": context_tokens, "sources": sources, "timings": _rounded(trace)}
+
+
+# Coalesces identical in-flight turns and limits concurrent turns per model (see src.scheduler)
+scheduler = Scheduler(answer_events)
+
+
+async def turn_async(query, model, priority=INTERACTIVE):
+    """The turn's final (done) event."""
+    done = None
+    async for event in scheduler.submit(query, model, priority):
+        if event.get("done"):
+            done = event
+    return done
+
+
+async def answer_async(query, model, priority=INTERACTIVE):
+    return (await turn_async(query, model, priority))["answer"]
+
+
+def turn(query, model, priority=INTERACTIVE):
+    """Blocking helper returning the turn's done event (answer, packed context, sources). Raises Overloaded."""
+    return aio.run(turn_async(query, model, priority))
+
+
+def answer(query, model, priority=INTERACTIVE):
+    """Blocking helper for callers outside the event loop (form posts, scripts). Raises Overloaded."""
+    return aio.run(answer_async(query, model, priority))
+
+
+def stream(query, model, priority=INTERACTIVE):
+    """Blocking generator over the turn's events, for streaming WSGI responses. Raises Overloaded."""
+    return aio.iterate(scheduler.submit(query, model, priority))
+
+
+async def generate_async(query, context, model, priority=BATCH, on_fallback=None):
+    """`generate_answer` under the same per-model admission as chat turns (eval and batch scripts)."""
+    admit = lambda admitted=model: scheduler.admission(admitted, priority)
+    async with admit(), contextlib.AsyncExitStack() as fallback_slot:
+        switch = _fallback_admission(admit, fallback_slot, on_fallback or (lambda fallback: None))
+        parts = [token async for token in stream_answer(query, context, model=model, on_fallback=switch)]
+    return "".join(parts).strip()
+
+
+def generate(query, context, model, priority=BATCH, on_fallback=None):
+    """Blocking `generate_async`: queues behind interactive turns by default. Raises Overloaded."""
+    return aio.run(generate_async(query, context, model, priority, on_fallback))
+
+
+def warm_up():
+    """
+    Optional start-up hook: loads the embedding (and re-ranking) model, opens the ES connection
+    pool and starts pinning the UI's models on the Ollama host in the background.
+    """
+    warm_up_embedder()
+    if RERANK_ENABLED:
+        get_reranker()
+    index_version(INDEX_ALL)
+    threading.Thread(target=pin_models, name="pin-models", daemon=True).start()
@@ -0,0 +1,62 @@
+import os
+import threading
+import numpy as np
+from src.config import REDUCTION_DIR
+
+# ---------------------------------------------------------------------------
+#  PCA dimension reduction of document/query vectors
+#  A reducer is fitted while an index version is built and saved next to it as
+#  REDUCTION_DIR/<physical index>.npz; queries are projected with the reducer of
+#  whichever physical index the alias currently points at.
+# ---------------------------------------------------------------------------
+
+
+class PCAReducer:
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (reduced_dim, dim)
+
+    @classmethod
+    def fit(cls, vectors, dims: int):
+        matrix = np.asarray(vectors, dtype=np.float64)
+        mean = matrix.mean(axis=0)
+        _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+        return cls(mean, vt[:dims])
+
+    def transform(self, vectors) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components)
+
+    @classmethod
+    def load(cls, path: str):
+        data = np.load(path)
+        return cls(data["mean"], data["components"])
+
+
+def reducer_path(index_name: str) -> str:
+    return os.path.join(REDUCTION_DIR, f"{index_name}.npz")
+
+
+_reducers = {}  # physical index -> reducer or None (fixed for the lifetime of that index)
+_lock = threading.Lock()
+
+
+def get_reducer(index_name: str, resolve):
+    """
+    Reducer for the physical index behind `index_name` (None when its vectors are not reduced).
+    `resolve` maps an alias to its physical index and is called on every lookup: every rebuild
+    fits a new PCA, so a cached alias would project queries with the previous build's basis
+    (or dimensions) right after a swap. Reducers themselves are cached per physical index.
+    """
+    physical = resolve(index_name)
+    with _lock:
+        if physical in _reducers:
+            return _reducers[physical]
+    path = reducer_path(physical)
+    reducer = PCAReducer.load(path) if os.path.exists(path) else None
+    with _lock:
+        _reducers[physical] = reducer
+    return reducer
@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+from src.metrics import timed, cache_lookup
+from src.config import (
+    RERANKER_MODEL, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE, RERANK_MS_PER_PAIR, RERANK_MAX_LENGTH,
+)
+
+_model = None  # process-wide CrossEncoder, loaded on first use
+_lock = threading.Lock()
+_scores = OrderedDict()  # (query, doc id) -> cross-encoder score, LRU
+_ms_per_pair = RERANK_MS_PER_PAIR  # running estimate used to fit the latency budget
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+                _model = CrossEncoder(RERANKER_MODEL, max_length=RERANK_MAX_LENGTH)
+    return _model
+
+
+def affordable_pairs(deadline):
+    """How many uncached pairs can be scored before `deadline` (time.monotonic()); None = unlimited."""
+    if deadline is None:
+        return None
+    remaining_ms = (deadline - time.monotonic()) * 1000
+    return max(0, int(remaining_ms / _ms_per_pair))
+
+
+def rerank_candidates(query, candidates, k, deadline=None):
+    """
+    Re-orders first-stage `candidates` (dicts with "id", "name" and "highlight") with the
+    cross-encoder and returns the best *k*, each with its "rerank_score".
+
+    Only as many candidates as the remaining latency budget allows are scored (best
+    first-stage candidates first); if not even *k* fit, the first-stage order is kept.
+    Scores are cached per (query, doc id).
+    """
+    global _ms_per_pair
+    with _lock:
+        cached = {c["id"]: _scores[(query, c["id"])] for c in candidates if (query, c["id"]) in _scores}
+
+    budget = affordable_pairs(deadline)
+    if budget is not None:
+        # cached pairs are free; extend the pool only as far as the budget allows
+        pool, uncached = [], 0
+        for c in candidates:
+            if c["id"] not in cached:
+                if uncached >= budget:
+                    break
+                uncached += 1
+            pool.append(c)
+        if len(pool) < min(k, len(candidates)):
+            return candidates[:k]
+        candidates = pool
+
+    todo = [c for c in candidates if c["id"] not in cached]
+    cache_lookup("rerank", "hit", len(candidates) - len(todo))
+    cache_lookup("rerank", "miss", len(todo))
+    if todo:
+        pairs = [(query, f"{c['name']}: {' '.join(c.get('highlight') or [])}") for c in todo]
+        start = time.perf_counter()
+        with timed("rerank"):
+            scores = get_model().predict(pairs, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            _ms_per_pair = 0.8 * _ms_per_pair + 0.2 * (elapsed_ms / len(todo))
+            for c, score in zip(todo, scores):
+                cached[c["id"]] = _scores[(query, c["id"])] = float(score)
+            while len(_scores) > RERANK_CACHE_SIZE:
+                _scores.popitem(last=False)
+
+    ranked = sorted(candidates, key=lambda c: cached[c["id"]], reverse=True)[:k]
+    return [dict(c, rerank_score=cached[c["id"]]) for c in ranked]
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from src.answer_cache import normalize_query
+from src.metrics import observe_stage, SCHEDULER_EVENTS
+from src.config import MODEL_CONCURRENCY, SCHEDULER_MAX_QUEUE
+
+# ---------------------------------------------------------------------------
+#  In-process scheduler in front of the RAG pipeline (runs on the src.aio loop)
+#  - single flight: identical in-flight (normalized query, model) turns share one
+#    computation and every caller receives the same event stream;
+#  - admission: at most MODEL_CONCURRENCY turns per model run at once, up to
+#    SCHEDULER_MAX_QUEUE wait (interactive before batch), the rest get Overloaded.
+# ---------------------------------------------------------------------------
+
+INTERACTIVE, BATCH = 0, 1  # priorities, lower is served first
+
+
+class Overloaded(Exception):
+    """The model's admission queue is full; the caller should retry later (HTTP 503)."""
+
+
+class _ModelGate:
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+
+    async def acquire(self, priority):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded(f"{len(self._waiters)} requests already queued")
+        entry = [priority, next(self._seq), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await entry[2]  # resolved by release(), which hands its slot over
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                self.release()  # the slot arrived together with the cancellation
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class _Flight:
+    """One running computation and the events it produced so far, replayed to late joiners."""
+
+    def __init__(self):
+        self.events = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self.task = None
+        self.changed = asyncio.Condition()
+
+    async def publish(self, event=None, error=None, finished=False):
+        async with self.changed:
+            if event is not None:
+                self.events.append(event)
+            self.error = error
+            self.finished = finished
+            self.changed.notify_all()
+
+    async def subscribe(self):
+        seen = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: seen < len(self.events) or self.finished)
+                new, finished, error = self.events[seen:], self.finished, self.error
+            seen += len(new)
+            for event in new:
+                yield event
+            if finished and seen == len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class Scheduler:
+    def __init__(self, events_fn, limits=MODEL_CONCURRENCY, max_queue=SCHEDULER_MAX_QUEUE):
+        """
+        `events_fn(query, model, admit)` is the pipeline's async event generator; it enters
+        `admit()` (an async context manager) around the work that needs a model slot, and
+        `admit(other_model)` before switching to another model (the LLM fallback).
+        """
+        self.events_fn = events_fn
+        self.limits = limits
+        self.max_queue = max_queue
+        self._gates = {}  # model -> _ModelGate
+        self._flights = {}  # (normalized query, model) -> _Flight
+
+    def _gate(self, model):
+        if model not in self._gates:
+            limit = self.limits.get(model, self.limits["default"])
+            self._gates[model] = _ModelGate(limit, self.max_queue)
+        return self._gates[model]
+
+    @asynccontextmanager
+    async def admission(self, model, priority=INTERACTIVE):
+        """A slot of `model`, waiting in its queue by priority. Raises Overloaded when the queue is full."""
+        gate = self._gate(model)
+        start = time.perf_counter()
+        try:
+            await gate.acquire(priority)
+        except Overloaded:
+            SCHEDULER_EVENTS.inc(model=model, event="rejected")
+            raise
+        observe_stage("queue", time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            gate.release()
+
+    async def _run(self, key, flight, query, model, priority):
+        try:
+            admit = lambda admitted=model: self.admission(admitted, priority)
+            async for event in self.events_fn(query, model, admit=admit):
+                await flight.publish(event)
+            await flight.publish(finished=True)
+        except Exception as exc:
+            await flight.publish(error=exc, finished=True)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def submit(self, query, model, priority=INTERACTIVE):
+        """
+        Async generator over the turn's events. Joins the in-flight computation for the same
+        (normalized query, model) if there is one; its final event then carries "shared": True.
+        Raises Overloaded when the model's queue is full.
+        """
+        key = (normalize_query(query), model)
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if shared:
+            SCHEDULER_EVENTS.inc(model=model, event="coalesced")
+        else:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, query, model, priority))
+        flight.subscribers += 1
+        try:
+            async for event in flight.subscribe():
+                yield dict(event, shared=True) if shared and event.get("done") else event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                flight.task.cancel()  # every caller went away
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
@@ -1,82 +1,399 @@
-from elasticsearch import Elasticsearch
-from src.embedder import embed
-from src.config import ES_HOST
+import asyncio
+from elasticsearch import Elasticsearch, AsyncElasticsearch, NotFoundError
+from src.embedder import embed_queries
+from src.reduction import get_reducer
+from src.reranker import rerank_candidates
+from src.metrics import timed, observe_es_took
+from src.config import (
+    ES_HOST, RETRIEVAL_MODE, KNN_NUM_CANDIDATES, RRF_RANK_CONSTANT, RRF_WINDOW, MSEARCH_BATCH_SIZE,
+    RERANK_CANDIDATES,
+)
 
 es = Elasticsearch(ES_HOST)
+async_es = AsyncElasticsearch(ES_HOST)  # used from the background loop in src.aio
 
-def hybrid_search(query, index_name, k):
-    """
-    Hybrid search: focuses on matching the query with document fields.
-    """
-    # Embed the full query for vector similarity
-    query_vector = embed([query])[0]
-
-    body = {
-        "size": k,
-        "query": {
-            "script_score": {
-                "query": {
-                    "bool": {
-                        "should": [
-                            {
-                                "multi_match": {
-                                    "query": query,
-                                    "fields": ["name^3", "description^1.5"],
-                                    "type": "best_fields"
-                                }
-                            },
-                            {
-                                "multi_match": {
-                                    "query": query,
-                                    "fields": ["name", "description"],
-                                    "type": "most_fields"
-                                }
-                            }
-                        ]
+# script_score: exact cosine over every lexical match (brute force)
+# knn:          HNSW kNN section linearly combined with BM25 (0.7 / 0.3 boosts)
+# rrf:          HNSW kNN and BM25 run separately and merged with reciprocal rank fusion
+RETRIEVAL_MODES = ("script_score", "knn", "rrf")
+
+# Per-caller response shapes: which _source fields come back and how much highlighting.
+# "ids" returns only ids and scores; "rerank" is the cheap first stage of re-ranked
+# retrieval (names plus one short snippet per candidate). "chat" and "eval" return neither
+# the stored sentence split (a second copy of the description) nor its vectors:
+# `attach_sentences` fetches both for the docs that get packed.
+FIELD_PROFILES = {
+    "chat": {
+        "_source": {"includes": ["type", "name", "description"]},
+        "highlight": {"fragment_size": 700, "number_of_fragments": 3},
+    },
+    "eval": {
+        "_source": {"includes": ["type", "name", "description", "keywords"]},
+        "highlight": {"fragment_size": 700, "number_of_fragments": 3},
+    },
+    "debug": {
+        "_source": {"excludes": ["vector", "sentence_vectors"]},
+        "highlight": {"fragment_size": 700, "number_of_fragments": 3},
+    },
+    "ids": {
+        "_source": False,
+        "highlight": None,
+    },
+    "rerank": {
+        "_source": {"includes": ["type", "name"]},
+        "highlight": {"fragment_size": 300, "number_of_fragments": 1, "no_match_size": 300},
+    },
+}
+
+# Keeps only what collect_results reads, so ES serializes and we decode less JSON
+_FILTER_PATH = ["took", "hits.hits._id", "hits.hits._score", "hits.hits._source", "hits.hits.highlight"]
+_MSEARCH_FILTER_PATH = ["responses.error"] + [f"responses.{path}" for path in _FILTER_PATH]
+
+
+def _lexical_query(query):
+    return {
+        "bool": {
+            "should": [
+                {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["name^3", "description^1.5"],
+                        "type": "best_fields"
                     }
                 },
-                "script": {
-                    "source": (
-                        "0.7 * cosineSimilarity(params.query_vector, 'vector') + "
-                        "0.3 * _score"
-                    ),
-                    "params": {
-                        "query_vector": query_vector
+                {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["name", "description"],
+                        "type": "most_fields"
                     }
                 }
+            ]
+        }
+    }
+
+
+def _highlight(query, fragment_size, number_of_fragments, no_match_size=0):
+    # highlight_query keeps fragments available for hits that only matched through kNN;
+    # no_match_size falls back to the start of the description when nothing matches
+    return {
+        "highlight_query": _lexical_query(query),
+        "fields": {
+            "description": {
+                "fragment_size": fragment_size,
+                "number_of_fragments": number_of_fragments,
+                "no_match_size": no_match_size,
+                "pre_tags": [""],
+                "post_tags": [""]
             }
-        },
-        "highlight": {
-            "fields": {
-                "description": {
-                    "fragment_size": 700,
-                    "number_of_fragments": 3,
-                    "pre_tags": [""],
-                    "post_tags": [""]
+        }
+    }
+
+
+def _shape(body, query, profile):
+    shape = FIELD_PROFILES[profile]
+    body["_source"] = shape["_source"]
+    body["track_total_hits"] = False
+    if shape["highlight"]:
+        body["highlight"] = _highlight(query, **shape["highlight"])
+    return body
+
+
+def _knn_section(query_vector, k, num_candidates, boost=1.0):
+    return {
+        "field": "vector",
+        "query_vector": query_vector,
+        "k": k,
+        "num_candidates": max(num_candidates, k),
+        "boost": boost
+    }
+
+
+def build_search_bodies(query, query_vector, k, mode, num_candidates=KNN_NUM_CANDIDATES, profile="chat"):
+    """Returns the search bodies to run for one query (two for rrf, one otherwise)."""
+    return [_shape(body, query, profile) for body in _mode_bodies(query, query_vector, k, mode, num_candidates)]
+
+
+def _mode_bodies(query, query_vector, k, mode, num_candidates):
+    if mode == "script_score":
+        return [{
+            "size": k,
+            "query": {
+                "script_score": {
+                    "query": _lexical_query(query),
+                    "script": {
+                        "source": (
+                            "0.7 * cosineSimilarity(params.query_vector, 'vector') + "
+                            "0.3 * _score"
+                        ),
+                        "params": {
+                            "query_vector": query_vector
+                        }
+                    }
                 }
             }
-        }
+        }]
+    if mode == "knn":
+        lexical = _lexical_query(query)
+        lexical["bool"]["boost"] = 0.3
+        return [{
+            "size": k,
+            "query": lexical,
+            "knn": _knn_section(query_vector, k, num_candidates, boost=0.7)
+        }]
+    if mode == "rrf":
+        window = max(RRF_WINDOW, k)
+        return [
+            {"size": window, "query": _lexical_query(query)},
+            {"size": window, "knn": _knn_section(query_vector, window, num_candidates)},
+        ]
+    raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {RETRIEVAL_MODES}")
+
+
+def build_fetch_body(query, ids, profile="chat"):
+    """Fetches the given documents with the fields and highlights of `profile` (second stage of re-ranking)."""
+    return _shape({"size": len(ids), "query": {"bool": {"filter": {"ids": {"values": ids}}}}}, query, profile)
+
+
+def _rrf_merge(hit_lists, k):
+    """Reciprocal rank fusion: score(d) = sum over lists of 1 / (RRF_RANK_CONSTANT + rank)."""
+    fused, best = {}, {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, start=1):
+            fused[hit["_id"]] = fused.get(hit["_id"], 0.0) + 1.0 / (RRF_RANK_CONSTANT + rank)
+            # prefer the copy that carries highlight fragments
+            if hit["_id"] not in best or (hit.get("highlight") and not best[hit["_id"]].get("highlight")):
+                best[hit["_id"]] = hit
+    ranked = sorted(fused, key=fused.get, reverse=True)[:k]
+    return [dict(best[doc_id], _score=fused[doc_id]) for doc_id in ranked]
+
+
+def _enrich(hit, profile):
+    if profile == "ids":
+        return {"id": hit["_id"], "score": hit["_score"]}
+    source = hit.get("_source", {})
+    highlight = hit.get("highlight", {}).get("description", [])
+    score = hit["_score"]
+    doc_type = source.get("type", "unknown")
+    return {
+        "id": hit["_id"],
+        "type": doc_type,
+        "name": source.get("name", ""),
+        "description": source.get("description", ""),
+        "keywords": source.get("keywords", []),  # Include keywords in results
+        "professions": source.get("professions", []) if doc_type == "author" else None,
+        "writings": source.get("writings", []) if doc_type == "author" else None,
+        "category": source.get("category", "") if doc_type == "publication" else None,
+        "score": score,
+        "highlight": highlight,
+        "sentences": source.get("sentences", []),
+        "sentence_vectors": source.get("sentence_vectors")  # packed, see src.utils.pack_vectors
     }
 
-    response = es.search(index=index_name, body=body)
-    hits = response["hits"]["hits"]
+
+def msearch_payload(bodies, index_name):
+    """Interleaves header and body lines as expected by the _msearch API."""
+    searches = []
+    for body in bodies:
+        searches.extend([{"index": index_name}, body])
+    return searches
+
+
+def _hits(response):
+    if "error" in response:
+        raise RuntimeError(f"Search failed: {response['error']}")
+    # filter_path drops "hits" altogether when nothing matched
+    return response.get("hits", {}).get("hits", [])
+
+
+def collect_results(responses, k, mode, profile="chat"):
+    """Turns the raw responses produced for `build_search_bodies` into enriched results."""
+    if mode == "rrf":
+        hits = _rrf_merge([_hits(r) for r in responses], k)
+    else:
+        hits = _hits(responses[0])
+    return [_enrich(hit, profile) for hit in hits]
+
+
+def _in_rerank_order(fetched, ranked):
+    """Orders the fetched documents like `ranked` and scores them with the cross-encoder score."""
+    by_id = {result["id"]: result for result in fetched}
+    return [dict(by_id[c["id"]], score=c.get("rerank_score", c["score"])) for c in ranked if c["id"] in by_id]
+
+
+@timed("query_embed")
+def query_vectors_for(queries, index_name):
+    """
+    Embeds the queries in one call (through the query-vector LRU) and, if the target index
+    stores PCA-reduced vectors, projects them too.
+    """
+    query_vectors = embed_queries(queries)
+    reducer = get_reducer(index_name, physical_index)
+    if reducer is not None:
+        query_vectors = reducer.transform(query_vectors)
+    return query_vectors.tolist()
+
+
+def query_vector_for(query, index_name):
+    return query_vectors_for([query], index_name)[0]
+
+
+def _observe(responses):
+    for response in responses:
+        if "took" in response:
+            observe_es_took(response["took"])
+    return responses
+
+
+def _run(bodies, index_name):
+    with timed("es"):
+        if len(bodies) == 1:
+            responses = [es.search(index=index_name, body=bodies[0], filter_path=_FILTER_PATH)]
+        else:
+            responses = es.msearch(searches=msearch_payload(bodies, index_name),
+                                   filter_path=_MSEARCH_FILTER_PATH)["responses"]
+    return _observe(responses)
+
+
+@timed("search")
+def hybrid_search(query, index_name, k, mode=RETRIEVAL_MODE, num_candidates=KNN_NUM_CANDIDATES, profile="chat",
+                  rerank=False, candidates=RERANK_CANDIDATES, deadline=None, query_vector=None):
+    """
+    Hybrid search: focuses on matching the query with document fields.
+    `mode` selects how the dense and BM25 signals are combined (see RETRIEVAL_MODES);
+    `profile` selects the returned fields (see FIELD_PROFILES).
+
+    With `rerank`, `candidates` hits are over-fetched with the lean "rerank" profile,
+    re-ordered by the cross-encoder (within `deadline`, see src.reranker) and only the
+    best k are fetched with `profile`.
+    `query_vector` skips embedding when the caller already has it (from `query_vector_for`).
+    """
+    # Embed the full query for vector similarity
+    if query_vector is None:
+        query_vector = query_vector_for(query, index_name)
+
+    if not rerank:
+        bodies = build_search_bodies(query, query_vector, k, mode, num_candidates, profile)
+        return collect_results(_run(bodies, index_name), k, mode, profile)
+
+    n = max(candidates, k)
+    bodies = build_search_bodies(query, query_vector, n, mode, num_candidates, "rerank")
+    ranked = rerank_candidates(query, collect_results(_run(bodies, index_name), n, mode, "rerank"), k, deadline)
+    if not ranked:
+        return []
+    body = build_fetch_body(query, [c["id"] for c in ranked], profile)
+    return _in_rerank_order(collect_results(_run([body], index_name), len(ranked), "script_score", profile), ranked)
+
+
+def hybrid_search_batch(queries, index_name, k, mode=RETRIEVAL_MODE, num_candidates=KNN_NUM_CANDIDATES,
+                        profile="chat", batch_size=MSEARCH_BATCH_SIZE):
+    """
+    `hybrid_search` for many queries: one embedding call for all of them and one
+    _msearch round-trip per `batch_size` queries, with identical scoring.
+    Returns one result list per query, in input order.
+    """
+    query_vectors = query_vectors_for(list(queries), index_name)
     results = []
-    for hit in hits:
-        source = hit["_source"]
-        highlight = hit.get("highlight", {}).get("description", [])
-        score = hit["_score"]
-        doc_type = source.get("type", "unknown")
-        enriched_result = {
-            "type": doc_type,
-            "name": source.get("name", ""),
-            "description": source.get("description", ""),
-            "keywords": source.get("keywords", []),  # Include keywords in results
-            "professions": source.get("professions", []) if doc_type == "author" else None,
-            "writings": source.get("writings", []) if doc_type == "author" else None,
-            "category": source.get("category", "") if doc_type == "publication" else None,
-            "score": score,
-            "highlight": highlight
-        }
-        results.append(enriched_result)
+    for start in range(0, len(queries), batch_size):
+        chunk = range(start, min(start + batch_size, len(queries)))
+        per_query = [build_search_bodies(queries[i], query_vectors[i], k, mode, num_candidates, profile)
+                     for i in chunk]
+        bodies = [body for query_bodies in per_query for body in query_bodies]
+        responses = es.msearch(searches=msearch_payload(bodies, index_name),
+                               filter_path=_MSEARCH_FILTER_PATH)["responses"]
+        offset = 0
+        for query_bodies in per_query:
+            results.append(collect_results(responses[offset:offset + len(query_bodies)], k, mode, profile))
+            offset += len(query_bodies)
+    return results
 
+
+# Sentence vectors are a stored field; indices built before that still keep them in _source
+_SENTENCE_FETCH = {"stored_fields": ["sentence_vectors"], "source_includes": ["sentences", "sentence_vectors"],
+                   "filter_path": ["docs._id", "docs.fields", "docs._source"]}
+
+
+def _set_sentences(results, response):
+    by_id = {}
+    for doc in response.get("docs", []):
+        source = doc.get("_source", {})
+        packed = doc.get("fields", {}).get("sentence_vectors") or source.get("sentence_vectors")
+        by_id[doc["_id"]] = (source.get("sentences") or [], packed[0] if isinstance(packed, list) else packed)
+    for result in results:
+        result["sentences"], result["sentence_vectors"] = by_id.get(result["id"], ([], None))
     return results
+
+
+def attach_sentences(results, index_name):
+    """
+    Fetches the indexer's sentence split and packed sentence vectors for `results` (one mget)
+    and sets them on each result; documents without them are split and embedded instead.
+    """
+    if not results:
+        return results
+    with timed("es"):
+        response = es.mget(index=index_name, ids=[r["id"] for r in results], **_SENTENCE_FETCH)
+    return _set_sentences(results, response)
+
+
+def physical_index(index_name):
+    """Name(s) of the physical index behind `index_name`; changes whenever the alias is swapped."""
+    try:
+        return ",".join(sorted(es.indices.get_alias(name=index_name)))
+    except NotFoundError:
+        return index_name  # a concrete index rather than an alias
+
+
+def index_version(index_name):
+    """
+    Changes whenever the content behind `index_name` does: the physical index name(s) plus
+    the `updated_at` mark incremental runs leave in the mapping's _meta (see src.indexer).
+    """
+    try:
+        mappings = es.indices.get_mapping(index=index_name)
+    except NotFoundError:
+        return index_name
+    return ",".join(f"{name}@{mapping['mappings'].get('_meta', {}).get('updated_at', '')}"
+                    for name, mapping in sorted(mappings.items()))
+
+
+async def _run_async(bodies, index_name):
+    with timed("es"):
+        if len(bodies) == 1:
+            responses = [await async_es.search(index=index_name, body=bodies[0], filter_path=_FILTER_PATH)]
+        else:
+            responses = (await async_es.msearch(searches=msearch_payload(bodies, index_name),
+                                                filter_path=_MSEARCH_FILTER_PATH))["responses"]
+    return _observe(responses)
+
+
+async def hybrid_search_async(query, index_name, k, mode=RETRIEVAL_MODE, num_candidates=KNN_NUM_CANDIDATES,
+                              profile="chat", rerank=False, candidates=RERANK_CANDIDATES, deadline=None,
+                              query_vector=None):
+    """Same as `hybrid_search`, with embedding and re-ranking off-loaded to a thread and non-blocking ES I/O."""
+    with timed("search"):
+        if query_vector is None:
+            query_vector = await asyncio.to_thread(query_vector_for, query, index_name)
+
+        if not rerank:
+            bodies = build_search_bodies(query, query_vector, k, mode, num_candidates, profile)
+            return collect_results(await _run_async(bodies, index_name), k, mode, profile)
+
+        n = max(candidates, k)
+        bodies = build_search_bodies(query, query_vector, n, mode, num_candidates, "rerank")
+        pool = collect_results(await _run_async(bodies, index_name), n, mode, "rerank")
+        ranked = await asyncio.to_thread(rerank_candidates, query, pool, k, deadline)
+        if not ranked:
+            return []
+        body = build_fetch_body(query, [c["id"] for c in ranked], profile)
+        fetched = collect_results(await _run_async([body], index_name), len(ranked), "script_score", profile)
+        return _in_rerank_order(fetched, ranked)
+
+
+async def attach_sentences_async(results, index_name):
+    """Same as `attach_sentences`, with non-blocking ES I/O."""
+    if not results:
+        return results
+    with timed("es"):
+        response = await async_es.mget(index=index_name, ids=[r["id"] for r in results], **_SENTENCE_FETCH)
+    return _set_sentences(results, response)
@@ -1,13 +1,39 @@
 import json
-from bs4 import BeautifulSoup
-from sklearn.feature_extraction.text import TfidfVectorizer
-import nltk
-from nltk.corpus import stopwords
+import base64
+import hashlib
+import numpy as np
 
-def parse_bulk_json(path):
+def iter_bulk_json(path):
+    """
+    Lazily yields the documents of an Elasticsearch bulk file.
+    Bulk files alternate action and source lines; only the source lines are yielded.
+    """
     with open(path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    return [json.loads(lines[i]) for i in range(1, len(lines), 2)]
+        for i, line in enumerate(f):
+            if i % 2 == 1:
+                yield json.loads(line)
+
+def parse_bulk_json(path):
+    return list(iter_bulk_json(path))
+
+def content_hash(doc, salt=""):
+    """
+    Stable SHA-1 of a raw source document (key order independent).
+    `salt` lets callers invalidate every hash at once, e.g. when the embedding model changes.
+    """
+    payload = salt + json.dumps(doc, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def pack_vectors(vectors):
+    """L2-normalizes a (n, dim) matrix and packs it as a base64 float32 string for storage."""
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.maximum(norms, 1e-12)
+    return base64.b64encode(matrix.tobytes()).decode("ascii")
+
+def unpack_vectors(packed, dim):
+    """Inverse of `pack_vectors`: returns a (n, dim) float32 matrix."""
+    return np.frombuffer(base64.b64decode(packed), dtype=np.float32).reshape(-1, dim)
 
 def clean_text(doc, field):
     """
@@ -22,6 +48,8 @@ def clean_text(doc, field):
     if isinstance(raw_text, list):
         raw_text = " ".join(raw_text)
 
+    from bs4 import BeautifulSoup  # deferred: only the indexer cleans HTML
+
     # Remove HTML tags
     text = BeautifulSoup(raw_text, "html.parser").get_text()
 
@@ -32,19 +60,11 @@ def extract_keywords(text, language="romanian"):
     """
     Extracts keywords from a text using TF-IDF and stopword removal.
     The number of keywords is dynamically determined based on the text length.
+    For whole corpora prefer `src.keywords.KeywordExtractor`, which fits IDF once across all documents.
     :param text: The input text string.
     :param language: The language for stopword removal (default: Romanian).
     :return: A list of extracted keywords.
     """
-    stop_words = stopwords.words(language)
-    vectorizer = TfidfVectorizer(stop_words=stop_words)
-
-    # Dynamically calculate the number of keywords
-    num_keywords = max(10, len(text.split()) // 5)  # 1 keyword per 5 words, minimum 10
-
-    tfidf_matrix = vectorizer.fit_transform([text])
-    feature_names = vectorizer.get_feature_names_out()
-    scores = tfidf_matrix.toarray()[0]
-    keywords = sorted(zip(feature_names, scores), key=lambda x: x[1], reverse=True)
-    return [word for word, score in keywords[:num_keywords]]
+    from src.keywords import KeywordExtractor  # deferred: pulls in sklearn and nltk
 
+    return KeywordExtractor(language).partial_fit([text]).top_terms([text])[0]
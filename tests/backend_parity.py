@@ -0,0 +1,103 @@
+"""
+Parity check for the embedding backends.
+
+Encodes the Q&A questions and answers with the reference PyTorch model and with
+every alternative backend, then reports per-backend cosine agreement with the
+reference, single-query encoding latency and resident memory. Exits non-zero if
+any backend falls below its threshold.
+
+Every backend is loaded in a fresh subprocess, so its memory is measured on its own
+(RSS added by loading the model and encoding the texts) and not hidden by a previously
+loaded backend.
+
+    python -m tests.backend_parity
+"""
+
+import csv, json, os, pathlib, resource, statistics, subprocess, sys, tempfile, time
+import numpy as np
+
+from src.embedder import load_model, EMBED_BACKENDS
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+TEST_FILE      = pathlib.Path(__file__).with_name("qa.csv")
+MIN_COSINE     = {"onnx": 0.999, "onnx-int8": 0.98}   # worst-case agreement with "torch"
+LATENCY_ROUNDS = 50
+# ---------------------------------------------
+
+
+def load_texts():
+    with TEST_FILE.open(encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    return [r["question"].strip() for r in rows] + [r["expected_answer"].strip() for r in rows]
+
+
+def normalized(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def query_latency_ms(model, texts):
+    model.encode(texts[:1], show_progress_bar=False)  # warm-up
+    timings = []
+    for text in texts[:LATENCY_ROUNDS]:
+        t0 = time.perf_counter()
+        model.encode([text], show_progress_bar=False)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+
+def rss_mb():
+    """Current resident set size (not the peak, which never goes down)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # no procfs: the peak is still right in a process holding a single model
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(backend, out_path):
+    """Runs in the child process: encodes the texts with one backend and saves them to `out_path`."""
+    texts = load_texts()
+    rss_before = rss_mb()
+    model = load_model(backend)
+    np.save(out_path, normalized(model.encode(texts, show_progress_bar=False)))
+    rss = rss_mb() - rss_before
+    print(json.dumps({"query_ms": query_latency_ms(model, texts), "rss_mb": rss}))
+
+
+def run_backend(backend, workdir):
+    out_path = os.path.join(workdir, f"{backend}.npy")
+    proc = subprocess.run([sys.executable, "-m", "tests.backend_parity", "--measure", backend, out_path],
+                          capture_output=True, text=True, check=True)
+    stats = json.loads(proc.stdout.strip().splitlines()[-1])
+    return np.load(out_path), stats
+
+
+def main():
+    failures = []
+    print(f"{'backend':<10} {'min cos':>8} {'mean cos':>9} {'query ms':>9} {'+RSS MB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        ref, stats = run_backend("torch", workdir)
+        print(f"{'torch':<10} {1.0:>8.4f} {1.0:>9.4f} {stats['query_ms']:>9.2f} {stats['rss_mb']:>8.0f}")
+
+        for backend in EMBED_BACKENDS:
+            if backend == "torch":
+                continue
+            vectors, stats = run_backend(backend, workdir)
+            sims = np.sum(vectors * ref, axis=1)
+            print(f"{backend:<10} {sims.min():>8.4f} {sims.mean():>9.4f} {stats['query_ms']:>9.2f} "
+                  f"{stats['rss_mb']:>8.0f}")
+            if sims.min() < MIN_COSINE[backend]:
+                failures.append(f"{backend}: min cosine {sims.min():.4f} < {MIN_COSINE[backend]}")
+
+    if failures:
+        print("\nPARITY FAILED\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll backends within parity thresholds.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,88 @@
+"""
+Benchmark hybrid_search retrieval modes on growing slices of the corpus.
+
+For every corpus size a temporary index is filled from the live index with
+`_reindex` (max_docs), then each question of the Q&A CSV is run through every
+mode. Recall@k is measured against the exact script_score ranking.
+
+    python -m tests.bench_retrieval
+"""
+
+import csv, pathlib, statistics, time
+
+from src.search import es, hybrid_search, RETRIEVAL_MODES
+from src.config import INDEX_ALL
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+TEST_FILE      = pathlib.Path(__file__).with_name("qa.csv")
+CORPUS_SIZES   = [1_000, 5_000, 20_000, None]   # None = full live index
+TOP_K          = 3
+NUM_CANDIDATES = [50, 100, 200]                 # knn / rrf candidates to try
+MAX_QUESTIONS  = 100
+# ---------------------------------------------
+
+
+def load_questions():
+    with TEST_FILE.open(encoding="utf-8-sig") as f:
+        return [row["question"].strip() for row in csv.DictReader(f)][:MAX_QUESTIONS]
+
+
+def make_slice(size):
+    if size is None:
+        return INDEX_ALL
+    name = f"bench_{INDEX_ALL}_{size}"
+    if es.indices.exists(index=name):
+        es.indices.delete(index=name)
+    # INDEX_ALL is an alias; the response is keyed by the concrete index behind it
+    mapping = next(iter(es.indices.get_mapping(index=INDEX_ALL).values()))["mappings"]
+    es.indices.create(index=name, mappings=mapping)
+    es.reindex(source={"index": INDEX_ALL}, dest={"index": name}, max_docs=size,
+               wait_for_completion=True, refresh=True)
+    return name
+
+
+def run(questions, index_name, mode, num_candidates):
+    latencies, ids = [], []
+    for q in questions:
+        t0 = time.perf_counter()
+        hits = hybrid_search(q, index_name, TOP_K, mode=mode, num_candidates=num_candidates)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ids.append([h["name"] for h in hits])
+    return latencies, ids
+
+
+def recall(reference, candidate):
+    per_query = [len(set(r) & set(c)) / len(r) for r, c in zip(reference, candidate) if r]
+    return statistics.mean(per_query) if per_query else 0.0
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    questions = load_questions()
+    # warm up the embedding model and caches so the first mode is not penalized
+    hybrid_search(questions[0], INDEX_ALL, TOP_K)
+
+    print(f"{'docs':>8} {'mode':>12} {'cands':>6} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+    for size in CORPUS_SIZES:
+        index_name = make_slice(size)
+        docs = es.count(index=index_name)["count"]
+        ref_lat, reference = run(questions, index_name, "script_score", None)
+        print(f"{docs:>8} {'script_score':>12} {'-':>6} {percentile(ref_lat, 50):>8.1f} "
+              f"{percentile(ref_lat, 95):>8.1f} {1.0:>9.3f}")
+        for mode in RETRIEVAL_MODES:
+            if mode == "script_score":
+                continue
+            for cands in NUM_CANDIDATES:
+                lat, ids = run(questions, index_name, mode, cands)
+                print(f"{docs:>8} {mode:>12} {cands:>6} {percentile(lat, 50):>8.1f} "
+                      f"{percentile(lat, 95):>8.1f} {recall(reference, ids):>9.3f}")
+        if size is not None:
+            es.indices.delete(index=index_name)
+
+
+if __name__ == "__main__":
+    main()
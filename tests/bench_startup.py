@@ -0,0 +1,64 @@
+"""
+Measure cold-start cost of the entry points.
+
+Every measurement runs in a fresh interpreter so module caches do not hide
+import work:
+  * import time of app.py and of the heavy src modules,
+  * first embedding call (model load + first forward pass),
+  * first GET / and first full chat turn through the Flask test client.
+
+    python -m tests.bench_startup
+"""
+
+import json, os, secrets, subprocess, sys
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+RUNS       = 3
+QUESTION   = "În ce an a murit Mihai Eminescu?"
+LLM_MODEL  = "gemma3:12b"
+FULL_TURN  = False          # ← True also times a full question (needs ES + Ollama)
+# ---------------------------------------------
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+timings = {"import app": time.perf_counter() - t0}
+heavy = [m for m in ("torch", "sentence_transformers", "sklearn", "nltk", "bs4") if m in sys.modules]
+
+client = app.app.test_client()
+t0 = time.perf_counter(); client.get("/")
+timings["first GET /"] = time.perf_counter() - t0
+
+from src.embedder import embed
+t0 = time.perf_counter(); embed(["primul apel"])
+timings["first embed"] = time.perf_counter() - t0
+t0 = time.perf_counter(); embed(["al doilea apel"])
+timings["second embed"] = time.perf_counter() - t0
+
+if FULL_TURN:
+    t0 = time.perf_counter()
+    client.post("/", data={"question": QUESTION, "model": LLM_MODEL})
+    timings["first chat turn"] = time.perf_counter() - t0
+
+print(json.dumps({"timings": timings, "heavy_modules_after_import": heavy}))
+"""
+
+
+def main():
+    probe = f"FULL_TURN = {FULL_TURN}\nQUESTION = {QUESTION!r}\nLLM_MODEL = {LLM_MODEL!r}\n" + PROBE
+    # app.py refuses to start without a session key outside the development server
+    env = dict(os.environ, FLASK_SECRET_KEY=os.environ.get("FLASK_SECRET_KEY") or secrets.token_hex(32))
+    runs = []
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=env)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'stage':<20} " + " ".join(f"{'run ' + str(i + 1):>9}" for i in range(RUNS)))
+    for stage in runs[0]["timings"]:
+        print(f"{stage:<20} " + " ".join(f"{r['timings'][stage] * 1000:>7.0f}ms" for r in runs))
+    print("heavy modules loaded by `import app`:", runs[0]["heavy_modules_after_import"] or "none")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Check that src.sentences segments the corpus exactly like the previous tokenizer and
+compare their speed.
+
+The previous implementation is frozen below (the src/search1.py copy, whose acronym
+pattern was correct; the src/context_filter.py copy had an escaped backslash that
+never matched, so C.F.R.-style acronyms now also stay inside their sentence there).
+
+    python -m tests.bench_tokenizer [authors_bulk.json publications_bulk.json]
+"""
+
+import re, sys, time
+
+from src.sentences import sent_tokenize, iter_sentences
+from src.utils import iter_bulk_json, clean_text
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+DATA_FILES = ["data/authors_bulk.json", "data/publications_bulk.json"]
+REPEATS    = 3
+# ---------------------------------------------
+
+
+# ----------  FROZEN LEGACY TOKENIZER  ----------
+_ABBREVIATIONS = {
+    "j.", "jud.", "nr.", "vol.", "cap.", "fig.", "art.", "pag.", "sec.", "cca.",
+    "str.", "bl.", "sc.", "ap.", "mun.", "com.", "loc.", "nrcrt.", "crt.",
+    "d.", "dl.", "dna.", "dvs.", "dv.", "dom.", "dr.", "prof.", "ing.", "conf.",
+    "lect.", "acad.", "col.", "lt.", "cpt.", "mr.", "gen.",
+    "etc.", "cf.", "op.cit.", "ibid.", "n.b.", "p.s.",
+    "Al.", "Gh.", "I.", "Ion.", "Gr.", "V.", "M.", "O.", "G.", "E.", "Șt.", "T.",
+    "a.c.", "l.c.", "d.e.", "de ex.", "p.a.", "î.e.n.", "e.n.",
+    "ș.a.", "ș.a.m.d.",
+}
+_INITIAL_REGEX = re.compile(r"^[A-ZȘȚĂÂÎ]\.?")
+_TWO_LETTER_REGEX = re.compile(r"^[A-ZȘȚĂÂÎ][a-zăâîșț]\.?")
+
+
+def _is_bad_break(token):
+    token_strip = token.strip()
+    if any(token_strip.endswith(abbr) for abbr in _ABBREVIATIONS):
+        return True
+    if _INITIAL_REGEX.fullmatch(token_strip):
+        return True
+    if _TWO_LETTER_REGEX.fullmatch(token_strip):
+        return True
+    if re.fullmatch(r"(?:[A-Z]\.){2,}[A-Z]?", token_strip):
+        return True
+    return False
+
+
+def legacy_sent_tokenize(text):
+    if not text:
+        return []
+    chunks = re.split(r"(?<=[.!?]) +", text.strip())
+    sentences, i = [], 0
+    while i < len(chunks):
+        current = chunks[i]
+        while _is_bad_break(current) and i + 1 < len(chunks):
+            i += 1
+            current += " " + chunks[i]
+        sentences.append(current.strip())
+        i += 1
+    return sentences
+# -----------------------------------------------
+
+
+# Hand-picked edge cases, checked even when the corpus files are not available
+EDGE_CASES = [
+    "", "   ", "O.", "Al. I. Cuza a domnit. A murit în 1873.",
+    "Lucrează la C.F.R. Apoi pleacă. U.S.A. e departe!",
+    "Vezi vol. 2, pag. 14 etc. Apoi cap. III. Final?",
+    "Poemul apare în î.e.n. Totul ș.a.m.d. Gata.",
+    "De ex. Eminescu. Sau de ex. Creangă!  Două   spații.",
+    "Gh. Asachi (n. 1788 – d. 1869) a fost scriitor. Șt. O. Iosif la fel.",
+    "Anul II. Anul III. Primul gând. Al doilea gând.\nRând nou. Sfârșit",
+    "A.\nB. C. D.E.F. Gata.",
+]
+
+
+def load_texts(paths):
+    texts = []
+    for path in paths:
+        try:
+            texts.extend(clean_text(doc, "description") for doc in iter_bulk_json(path))
+        except FileNotFoundError:
+            print(f"skipping missing {path}")
+    return texts
+
+
+def timed(tokenize, texts):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        for text in texts:
+            tokenize(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(paths):
+    texts = EDGE_CASES + load_texts(paths)
+    mismatches = [t for t in texts if sent_tokenize(t) != legacy_sent_tokenize(t)]
+    assert all(list(iter_sentences(t)) == sent_tokenize(t) for t in texts)
+    n_chars = sum(map(len, texts))
+    print(f"{len(texts)} texts, {n_chars / 1e6:.1f} M chars, "
+          f"{sum(len(sent_tokenize(t)) for t in texts)} sentences, {len(mismatches)} mismatches")
+    for text in mismatches[:5]:
+        print("  mismatch:", text[:120])
+
+    legacy, compiled = timed(legacy_sent_tokenize, texts), timed(sent_tokenize, texts)
+    print(f"legacy   {legacy * 1000:9.1f} ms")
+    print(f"compiled {compiled * 1000:9.1f} ms  ({legacy / compiled:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DATA_FILES)
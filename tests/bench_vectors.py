@@ -0,0 +1,97 @@
+"""
+Compare two physical indices built with different vector settings
+(e.g. float32 hnsw with vectors in _source vs int8_hnsw / PCA / no vector in _source).
+
+Reports store size, dense-vector disk usage, hit payload size, response bytes per
+field profile (plus the sentences mget the chat turn makes), p50/p95 latency and
+recall@k against the baseline's exact script_score ranking.
+
+Build each variant with the matching VECTOR_* settings in src/config.py
+(`python src/indexer.py` keeps INDEX_KEEP_VERSIONS versions), then:
+
+    python -m tests.bench_vectors intellit_all_v<baseline> intellit_all_v<compact>
+"""
+
+import csv, json, pathlib, statistics, sys, time
+
+from src.search import es, hybrid_search, build_search_bodies, query_vectors_for, FIELD_PROFILES
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+TEST_FILE     = pathlib.Path(__file__).with_name("qa.csv")
+TOP_K         = 3
+MODES         = ["script_score", "knn"]
+MAX_QUESTIONS = 100
+# ---------------------------------------------
+
+
+def load_questions():
+    with TEST_FILE.open(encoding="utf-8-sig") as f:
+        return [row["question"].strip() for row in csv.DictReader(f)][:MAX_QUESTIONS]
+
+
+def sizes(index_name):
+    store = es.indices.stats(index=index_name, metric="store")["indices"][index_name]["primaries"]["store"]
+    usage = es.indices.disk_usage(index=index_name, run_expensive_tasks=True)[index_name]["fields"]
+    vector = usage.get("vector", {}).get("total_in_bytes", 0)
+    hit = es.search(index=index_name, size=1, query={"match_all": {}})["hits"]["hits"][0]
+    return store["size_in_bytes"], vector, len(json.dumps(hit["_source"]))
+
+
+def profile_bytes(questions, index_name):
+    """Mean serialized hits per search for every field profile, and of the sentences mget."""
+    vectors = query_vectors_for(questions, index_name)
+    totals = dict.fromkeys(list(FIELD_PROFILES) + ["sentences (mget)"], 0)
+    for q, vec in zip(questions, vectors):
+        for profile in FIELD_PROFILES:
+            body = build_search_bodies(q, vec, TOP_K, "script_score", profile=profile)[0]
+            hits = es.search(index=index_name, body=body)["hits"]["hits"]
+            totals[profile] += len(json.dumps(hits))
+        ids = [h["_id"] for h in hits]
+        docs = es.mget(index=index_name, ids=ids, stored_fields=["sentence_vectors"],
+                       source_includes=["sentences", "sentence_vectors"])["docs"]
+        totals["sentences (mget)"] += len(json.dumps(docs))
+    return {name: total / len(questions) for name, total in totals.items()}
+
+
+def run(questions, index_name, mode):
+    latencies, names = [], []
+    for q in questions:
+        t0 = time.perf_counter()
+        hits = hybrid_search(q, index_name, TOP_K, mode=mode)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        names.append([h["name"] for h in hits])
+    return latencies, names
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main(baseline, compact):
+    questions = load_questions()
+    hybrid_search(questions[0], baseline, TOP_K)  # warm-up
+    _, reference = run(questions, baseline, "script_score")
+
+    print(f"{'index':<32} {'store MB':>9} {'vector MB':>10} {'hit KB':>7}")
+    for name in (baseline, compact):
+        store, vector, hit = sizes(name)
+        print(f"{name:<32} {store / 2**20:>9.1f} {vector / 2**20:>10.1f} {hit / 1024:>7.1f}")
+
+    print(f"\n{'index':<32} {'profile':>24} {'KB/search':>10}")
+    for name in (baseline, compact):
+        for profile, size in profile_bytes(questions, name).items():
+            print(f"{name:<32} {profile:>24} {size / 1024:>10.1f}")
+
+    print(f"\n{'index':<32} {'mode':>12} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+    for name in (baseline, compact):
+        for mode in MODES:
+            lat, names = run(questions, name, mode)
+            rec = statistics.mean(len(set(r) & set(n)) / len(r) for r, n in zip(reference, names) if r)
+            print(f"{name:<32} {mode:>12} {percentile(lat, 50):>8.1f} {percentile(lat, 95):>8.1f} {rec:>9.3f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    main(sys.argv[1], sys.argv[2])
@@ -5,7 +5,7 @@ question,expected_answer,difficulty  (simple|medium|complex)
 
 import csv, pathlib, statistics, collections, re, string, unicodedata
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
 
 # ----------  CONFIGURABLE CONSTANTS  ----------
 TEST_FILE      = pathlib.Path("C:/Users/farca/Documents/POLI/Licenta/Aplicatie/tests/qa.csv")
@@ -20,14 +20,20 @@ DEBUG_ROWS     = False                   # e.g. 5 to limit rows in quick tests
 # ---------------------------------------------
 
 # --- project imports ---
-from src.search import hybrid_search
+from src.search import hybrid_search, hybrid_search_batch
 from src.generator import generate_answer
 from src.config import INDEX_ALL
 from src.search1 import build_filtered_context
 from src.context_filter import build_filtered_context_highlights
+from src.embedder import get_model
+from src.config import MODEL_NAME
 # ----------------------
 
-embedder = SentenceTransformer(SIM_MODEL)
+if SIM_MODEL == MODEL_NAME:
+    embedder = get_model()  # share the retrieval model instead of loading a second copy
+else:
+    from sentence_transformers import SentenceTransformer
+    embedder = SentenceTransformer(SIM_MODEL)
 cos      = lambda a, b: float(util.cos_sim(a, b))
 
 # ---------- helpers --------------------------------------------------
@@ -58,8 +64,9 @@ def max_sentence_similarity(gold: str, prediction: str) -> float:
     return max(sims) if sims else 0.0
 # ---------------------------------------------------------------------
 
-def run_rag(question: str) -> str:
-    hits = hybrid_search(question, index_name=INDEX_ALL, k=TOP_K_DOCS)
+def run_rag(question: str, hits: list[dict] | None = None) -> str:
+    if hits is None:
+        hits = hybrid_search(question, index_name=INDEX_ALL, k=TOP_K_DOCS, profile="eval")
     if DEBUG:
         print(f"  • Retrieved top-{TOP_K_DOCS} docs:")
         for h in hits:
@@ -76,46 +83,50 @@ def run_rag(question: str) -> str:
 def evaluate():
     stats = collections.defaultdict(lambda: {"total":0,"correct":0,"no_data":0,"sims":[]})
     with TEST_FILE.open(encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for idx,row in enumerate(tqdm(reader, desc="Evaluating")):
-            if DEBUG_ROWS and idx >= DEBUG_ROWS: break
-
-            q     = row["question"].strip()
-            gold  = row["expected_answer"].strip()
-            diff  = row["difficulty"].strip().lower()
-
-            if DEBUG:
-                print(f"\n=== [{idx+1}]  {diff.upper()}  ===============================")
-                print("Q:", q)
-                print("Gold:", gold)
-
-            pred  = run_rag(q)
-            rec   = stats[diff];  rec["total"] += 1
-
-            # --- no-data shortcut
-            if NO_DATA_MARK in pred.lower():
-                rec["no_data"] += 1
-                if DEBUG: print("  ⚠  Model returned NO-DATA string.")
-                continue
-
-            # --- containment shortcut
-            if contains_all_keywords(gold, pred):
-                rec["correct"] += 1
-                rec["sims"].append(1.0)
-                if DEBUG: print("  ✔  Containment satisfied → correct.")
-                continue
-
-            # --- windowed cosine
-            max_sim = max_sentence_similarity(gold, pred)
-            rec["sims"].append(max_sim)
-            if DEBUG: print(f"  • Max sentence-cosine = {max_sim:.3f}")
-
-            SIM_THRESHOLD = SIM_THRESHOLDS[diff]
-            if max_sim >= SIM_THRESHOLD:
-                rec["correct"] += 1
-                if DEBUG: print(f"  ✔  Above threshold ({SIM_THRESHOLD}) → correct.")
-            elif DEBUG:
-                print("  ✘  Below threshold → incorrect.")
+        rows = list(csv.DictReader(f))
+    if DEBUG_ROWS:
+        rows = rows[:DEBUG_ROWS]
+
+    # retrieval for every question up front: one embedding call + batched _msearch
+    all_hits = hybrid_search_batch([row["question"].strip() for row in rows],
+                                   index_name=INDEX_ALL, k=TOP_K_DOCS, profile="eval")
+    for idx,(row,hits) in enumerate(tqdm(zip(rows, all_hits), total=len(rows), desc="Evaluating")):
+        q     = row["question"].strip()
+        gold  = row["expected_answer"].strip()
+        diff  = row["difficulty"].strip().lower()
+
+        if DEBUG:
+            print(f"\n=== [{idx+1}]  {diff.upper()}  ===============================")
+            print("Q:", q)
+            print("Gold:", gold)
+
+        pred  = run_rag(q, hits)
+        rec   = stats[diff];  rec["total"] += 1
+
+        # --- no-data shortcut
+        if NO_DATA_MARK in pred.lower():
+            rec["no_data"] += 1
+            if DEBUG: print("  ⚠  Model returned NO-DATA string.")
+            continue
+
+        # --- containment shortcut
+        if contains_all_keywords(gold, pred):
+            rec["correct"] += 1
+            rec["sims"].append(1.0)
+            if DEBUG: print("  ✔  Containment satisfied → correct.")
+            continue
+
+        # --- windowed cosine
+        max_sim = max_sentence_similarity(gold, pred)
+        rec["sims"].append(max_sim)
+        if DEBUG: print(f"  • Max sentence-cosine = {max_sim:.3f}")
+
+        SIM_THRESHOLD = SIM_THRESHOLDS[diff]
+        if max_sim >= SIM_THRESHOLD:
+            rec["correct"] += 1
+            if DEBUG: print(f"  ✔  Above threshold ({SIM_THRESHOLD}) → correct.")
+        elif DEBUG:
+            print("  ✘  Below threshold → incorrect.")
 
     # ------------- report -------------
     print("\n===========  RESULTS  ===========")
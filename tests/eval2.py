@@ -0,0 +1,258 @@
+"""
+Concurrent, resumable evaluation of the RAG chatbot on the q&a CSV:
+question,expected_answer,difficulty[,doc_id]   (difficulty: simple|medium|complex;
+doc_id: optional "|"-separated ids of the documents that hold the answer)
+
+Every finished question is appended to a JSONL checkpoint (retrieved hits, context,
+answer, per-stage timings), so an interrupted run resumes where it stopped and
+`--replay` re-scores a finished run without touching Elasticsearch or the LLM.
+
+    python -m tests.eval2 [--model llama3.3:latest] [--workers 4] [--limit 50]
+    python -m tests.eval2 --replay            # re-score the checkpoint only
+    python -m tests.eval2 --fresh             # discard the checkpoint first
+"""
+
+import argparse, csv, json, pathlib, re, time, unicodedata
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from tqdm import tqdm
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+TEST_FILE      = pathlib.Path(__file__).with_name("qa.csv")
+CHECKPOINT_DIR = pathlib.Path(".cache/eval2")   # one <model>.jsonl per LLM tag
+
+LLM_MODEL_TAG  = "llama3.3:latest"
+LLM_WORKERS    = 4                      # questions in flight; LLM calls also wait for a MODEL_CONCURRENCY slot
+LLM_PRIORITY   = "batch"                # "batch" queues behind interactive chat turns of the same process
+SIM_MODEL      = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+SIM_THRESHOLDS = {"simple": 0.7, "medium": 0.6, "complex": 0.5}   # sentence-level cosine ≥ threshold ⇒ correct
+TOP_K_DOCS     = 3                      # docs sent to the LLM
+RECALL_KS      = (1, 3, 5, 10)          # retrieval is run with k = max(RECALL_KS)
+RECALL_MIN_TOKEN_SHARE = 0.8            # without doc_id: a hit is relevant if it contains this share of the gold tokens
+NO_DATA_MARK   = "nu există suficiente date"  # model's 'no info' reply
+STAGES         = ("embed", "search", "context", "generate")
+# ---------------------------------------------
+
+# --- project imports ---
+from src.config import INDEX_ALL, MODEL_NAME
+from src.search import hybrid_search, query_vector_for, attach_sentences
+from src.context_filter import pack_context, context_budget
+from src.pipeline import generate
+from src.scheduler import INTERACTIVE, BATCH
+# ----------------------
+
+
+# ---------- scoring helpers ------------------------------------------
+def normalize(txt: str) -> str:
+    txt = "".join(ch for ch in txt.lower() if not unicodedata.category(ch).startswith("P"))
+    return re.sub(r"\s+", " ", txt).strip()
+
+
+def gold_tokens(gold: str) -> set:
+    return {t for t in normalize(gold).split() if len(t) > 2}
+
+
+def contains_all_keywords(gold: str, pred: str) -> bool:
+    return gold_tokens(gold).issubset(normalize(pred).split())
+
+
+def is_relevant(hit: dict, row: dict) -> bool:
+    doc_ids = [d.strip() for d in (row.get("doc_id") or "").split("|") if d.strip()]
+    if doc_ids:
+        return hit["id"] in doc_ids
+    tokens = gold_tokens(row["expected_answer"])
+    if not tokens:
+        return False
+    text = set(normalize(f"{hit['name']} {hit['description']}").split())
+    return len(tokens & text) / len(tokens) >= RECALL_MIN_TOKEN_SHARE
+
+
+def similarity_encoder():
+    """list[str] -> normalized embedding matrix; reuses the retrieval model when SIM_MODEL is the same."""
+    if SIM_MODEL == MODEL_NAME:
+        from src.embedder import embed_array
+        return embed_array
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(SIM_MODEL)
+    return lambda texts: model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def max_sentence_similarities(pairs, encode) -> list[float]:
+    """Max cosine between each gold answer and the sentences of its prediction, in one encode call."""
+    sentences = [[s for s in re.split(r"(?<=[.!?]) +", pred) if s.strip()] for _, pred in pairs]
+    texts = [gold for gold, _ in pairs] + [s for sents in sentences for s in sents]
+    if not texts:
+        return []
+    vectors = encode(texts)
+    golds, offset, sims = vectors[:len(pairs)], len(pairs), []
+    for gold_vec, sents in zip(golds, sentences):
+        block = vectors[offset:offset + len(sents)]
+        offset += len(sents)
+        sims.append(float(np.max(block @ gold_vec)) if len(sents) else 0.0)
+    return sims
+# ---------------------------------------------------------------------
+
+
+# ---------- running --------------------------------------------------
+def run_question(row: dict, model: str, priority: int = BATCH) -> dict:
+    question = row["question"].strip()
+    timings = {}
+
+    t0 = time.perf_counter()
+    query_vector = query_vector_for(question, INDEX_ALL)
+    t1 = time.perf_counter()
+    hits = hybrid_search(question, INDEX_ALL, k=max(RECALL_KS), profile="eval", query_vector=query_vector)
+    t2 = time.perf_counter()
+    packed = attach_sentences(hits[:TOP_K_DOCS], INDEX_ALL)
+    context, context_tokens = pack_context(packed, question, context_budget(model))
+    t3 = time.perf_counter()
+    answered_by = [model]
+    answer = generate(question, context, model, priority=priority, on_fallback=answered_by.append)
+    t4 = time.perf_counter()
+
+    for stage, start, end in zip(STAGES, (t0, t1, t2, t3), (t1, t2, t3, t4)):
+        timings[stage] = (end - start) * 1000
+    return {
+        "question": question,
+        "hits": [{"id": h["id"], "name": h["name"], "description": h["description"], "score": h["score"]}
+                 for h in hits],
+        "context": context,
+        "context_tokens": context_tokens,
+        "answer": answer,
+        "model": model,
+        "answered_by": answered_by[-1],  # FALLBACK_MODEL when `model` timed out or kept failing
+        "timings_ms": timings,
+    }
+
+
+def load_checkpoint(path: pathlib.Path) -> dict:
+    records = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records[record["question"]] = record
+    return records
+
+
+def run_all(rows, model, workers, checkpoint: pathlib.Path, priority: int = BATCH) -> dict:
+    records = load_checkpoint(checkpoint)
+    todo = [row for row in rows if row["question"].strip() not in records]
+    print(f"{len(records)} questions already in {checkpoint}, {len(todo)} to run")
+    if not todo:
+        return records
+
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    with checkpoint.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_question, row, model, priority): row for row in todo}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Evaluating"):
+            try:
+                record = future.result()
+            except Exception as exc:  # keep going; the row is retried on the next run
+                print(f"  ✘  {futures[future]['question'][:60]}…: {exc}")
+                continue
+            # written from this thread only, one line per finished question
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            records[record["question"]] = record
+    elapsed = time.perf_counter() - started
+    print(f"ran {len(todo)} questions in {elapsed:.1f}s with {workers} workers "
+          f"({len(todo) / elapsed:.2f} questions/s)")
+    return records
+# ---------------------------------------------------------------------
+
+
+# ---------- report ---------------------------------------------------
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def report(rows, records, encode):
+    scored = [(row, records[row["question"].strip()]) for row in rows if row["question"].strip() in records]
+    if not scored:
+        print("nothing to score")
+        return
+
+    # answer accuracy: no-data and containment shortcuts, then one batched similarity pass
+    stats = defaultdict(lambda: {"total": 0, "correct": 0, "no_data": 0, "sims": []})
+    needs_sim = []
+    for row, record in scored:
+        diff, gold, pred = row["difficulty"].strip().lower(), row["expected_answer"].strip(), record["answer"]
+        rec = stats[diff]
+        rec["total"] += 1
+        if NO_DATA_MARK in pred.lower():
+            rec["no_data"] += 1
+        elif contains_all_keywords(gold, pred):
+            rec["correct"] += 1
+            rec["sims"].append(1.0)
+        else:
+            needs_sim.append((diff, gold, pred))
+    for (diff, _, _), sim in zip(needs_sim, max_sentence_similarities([(g, p) for _, g, p in needs_sim], encode)):
+        stats[diff]["sims"].append(sim)
+        stats[diff]["correct"] += sim >= SIM_THRESHOLDS[diff]
+
+    print("\n===========  RESULTS  ===========")
+    overall_total = overall_correct = 0
+    for diff in ("simple", "medium", "complex"):
+        t, c, nd = stats[diff]["total"], stats[diff]["correct"], stats[diff]["no_data"]
+        if not t:
+            continue
+        avg = float(np.mean(stats[diff]["sims"])) if stats[diff]["sims"] else 0
+        print(f"{diff.capitalize():>7}: total={t:3d}  correct={c:3d}  no-data={nd:3d}  "
+              f"accuracy={c / t:.2%}  avg-sim={avg:.3f}")
+        overall_total += t
+        overall_correct += c
+    print("---------------------------------")
+    print(f"Overall accuracy: {overall_correct / overall_total:.2%}")
+    fallbacks = sum(r.get("answered_by", r.get("model")) != r.get("model") for _, r in scored)
+    if fallbacks:
+        print(f"Answered by the fallback model: {fallbacks}")
+
+    print("\n---------  RETRIEVAL  -----------")
+    source = "doc_id" if any(row.get("doc_id") for row, _ in scored) else f"≥{RECALL_MIN_TOKEN_SHARE:.0%} gold tokens"
+    for k in RECALL_KS:
+        found = sum(any(is_relevant(hit, row) for hit in record["hits"][:k]) for row, record in scored)
+        print(f"recall@{k:<3} {found / len(scored):.2%}   (relevance: {source})")
+
+    print("\n----------  LATENCY (ms)  ----------")
+    print(f"{'stage':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    per_stage = {stage: [r["timings_ms"][stage] for _, r in scored] for stage in STAGES}
+    per_stage["total"] = [sum(r["timings_ms"].values()) for _, r in scored]
+    for stage, values in per_stage.items():
+        print(f"{stage:<10} {percentile(values, 50):8.1f} {percentile(values, 95):8.1f} "
+              f"{percentile(values, 99):8.1f} {max(values):8.1f}")
+    print(f"context tokens: mean {np.mean([r['context_tokens'] for _, r in scored]):.0f}")
+# ---------------------------------------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the RAG chatbot on the q&a CSV.")
+    parser.add_argument("--model", default=LLM_MODEL_TAG)
+    parser.add_argument("--workers", type=int, default=LLM_WORKERS)
+    parser.add_argument("--priority", choices=("batch", "interactive"), default=LLM_PRIORITY,
+                        help="admission priority of the LLM calls (see src.scheduler)")
+    parser.add_argument("--limit", type=int, default=None, help="only the first N rows")
+    parser.add_argument("--replay", action="store_true", help="re-score the checkpoint without ES or LLM calls")
+    parser.add_argument("--fresh", action="store_true", help="discard the checkpoint before running")
+    args = parser.parse_args()
+
+    with TEST_FILE.open(encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))[:args.limit]
+    checkpoint = CHECKPOINT_DIR / (re.sub(r"[^\w.-]", "_", args.model) + ".jsonl")
+
+    if args.replay:
+        records = load_checkpoint(checkpoint)
+    else:
+        if args.fresh and checkpoint.exists():
+            checkpoint.unlink()
+        priority = BATCH if args.priority == "batch" else INTERACTIVE
+        records = run_all(rows, args.model, args.workers, checkpoint, priority)
+    report(rows, records, similarity_encoder())
+
+
+if __name__ == "__main__":
+    main()
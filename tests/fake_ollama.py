@@ -0,0 +1,238 @@
+"""
+Offline stand-in for the Ollama HTTP API (/api/generate, /api/ps, /api/tags), with
+scriptable cold loads, failures, slow starts and token pacing, for exercising src/generator.py.
+
+Serve it and point the app at it:
+
+    python -m tests.fake_ollama --port 11435 --load llama3.3:latest=40 --fail qwen2.5:72b=2
+    OLLAMA_HOST=http://127.0.0.1:11435 python app.py
+
+or run the built-in checks (streaming, retry, timeout and latency-budget fallback, pinning):
+
+    python -m tests.fake_ollama --selftest
+"""
+
+import argparse, json, os, sys, threading, time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------  CONFIGURABLE CONSTANTS  ----------
+ANSWER      = "Mihai Eminescu s-a născut la 15 ianuarie 1850, la Botoșani."
+TOKEN_DELAY = 0.01  # seconds between streamed tokens
+KEEP_ALIVE  = 300   # seconds a model stays loaded when the request does not say
+# ---------------------------------------------
+
+
+class FakeOllama:
+    """Server state: per-model cold-load delays and failure budgets, loaded models, request log."""
+
+    def __init__(self, load_seconds=None, failures=None, token_delay=TOKEN_DELAY, think_seconds=None):
+        self.load_seconds = dict(load_seconds or {})  # model -> cold load delay
+        self.failures = dict(failures or {})  # model -> number of 503s before it answers
+        self.think_seconds = dict(think_seconds or {})  # model -> empty chunks streamed before the answer
+        self.token_delay = token_delay
+        self.loaded = {}  # model -> loaded until (epoch seconds)
+        self.requests = []  # decoded /api/generate bodies
+        self.lock = threading.Lock()
+
+    def _keep_alive_seconds(self, value):
+        if value is None:
+            return KEEP_ALIVE
+        if isinstance(value, (int, float)):
+            return float("inf") if value < 0 else value
+        units = {"s": 1, "m": 60, "h": 3600}
+        return float(value[:-1]) * units[value[-1]] if value[-1] in units else float(value)
+
+    def generate(self, body):
+        """Returns (status, list of response objects); the caller streams or joins them."""
+        model = body.get("model", "")
+        with self.lock:
+            self.requests.append(body)
+            if self.failures.get(model, 0) > 0:
+                self.failures[model] -= 1
+                return 503, [{"error": f"{model} is temporarily unavailable"}]
+            cold = self.loaded.get(model, 0) < time.time()
+        if cold:
+            time.sleep(self.load_seconds.get(model, 0))
+        with self.lock:
+            self.loaded[model] = time.time() + self._keep_alive_seconds(body.get("keep_alive"))
+
+        created = datetime.now(timezone.utc).isoformat()
+        prompt = body.get("prompt") or ""
+        if not prompt:
+            return 200, [{"model": model, "created_at": created, "response": "", "done": True, "done_reason": "load"}]
+        tokens = [word + " " for word in ANSWER.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        limit = (body.get("options") or {}).get("num_predict")
+        if limit:
+            tokens = tokens[:limit]
+        parts = [{"model": model, "created_at": created, "response": t, "done": False} for t in tokens]
+        # alive but slow: empty chunks (e.g. prompt evaluation) until the first token
+        idle = int(self.think_seconds.get(model, 0) / self.token_delay) if self.token_delay else 0
+        parts[:0] = [{"model": model, "created_at": created, "response": "", "done": False}] * idle
+        parts.append({"model": model, "created_at": created, "response": "", "done": True, "done_reason": "stop",
+                      "prompt_eval_count": max(1, len(prompt) // 4), "eval_count": len(tokens)})
+        return 200, parts
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, obj):
+            data = json.dumps(obj).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/ps":
+                with state.lock:
+                    models = [{"name": m, "model": m} for m, until in state.loaded.items() if until > time.time()]
+                self._send_json(200, {"models": models})
+            elif self.path == "/api/tags":
+                names = sorted(set(state.load_seconds) | set(state.loaded))
+                self._send_json(200, {"models": [{"name": m, "model": m} for m in names]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != "/api/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+            status, parts = state.generate(body)
+            if status != 200 or not body.get("stream", True):
+                merged = dict(parts[-1], response="".join(p.get("response", "") for p in parts))
+                self._send_json(status, parts[0] if status != 200 else merged)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for part in parts:
+                    line = json.dumps(part).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.flush()
+                    time.sleep(state.token_delay)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout or closed stream)
+
+    return Handler
+
+
+def serve(state, port=0):
+    """Starts the fake server in a daemon thread; returns (server, base url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---------- self-test --------------------------------------------------
+def selftest():
+    state = FakeOllama()
+    server, url = serve(state)
+    os.environ["OLLAMA_HOST"] = url  # read by src.config on import
+
+    from src import generator, aio
+    generator.OLLAMA_READ_TIMEOUT = 1.0
+    generator.OLLAMA_RETRY_BACKOFF = 0.05
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"{'PASS' if ok else 'FAIL'}  {name}  {detail}")
+
+    answer = generator.generate_answer("q", "ctx", model="llama3.3:latest")
+    sent = state.requests[-1]
+    check("sync streaming answer", answer == ANSWER, repr(answer))
+    check("keep_alive and per-model options sent",
+          sent.get("keep_alive") == generator.keep_alive("llama3.3:latest") and sent.get("options") == generator.model_options("llama3.3:latest"),
+          f"{sent.get('keep_alive')} {sent.get('options')}")
+
+    async def collect(model, on_fallback=None):
+        return "".join([t async for t in generator.stream_answer("q", "ctx", model=model, on_fallback=on_fallback)])
+    check("async streaming answer", aio.run(collect("llama3.3:latest")) == ANSWER)
+
+    state.failures["qwen2.5:72b"] = 2
+    before = len(state.requests)
+    answer = generator.generate_answer("q", "ctx", model="qwen2.5:72b")
+    check("retry with jitter after 503s", answer == ANSWER and len(state.requests) - before == 3,
+          f"{len(state.requests) - before} requests")
+
+    state.load_seconds["llama4:16x17b"] = 3
+    before = len(state.requests)
+    t0 = time.perf_counter()
+    reported = []
+
+    async def on_fallback(model):
+        reported.append(model)
+    answer = aio.run(collect("llama4:16x17b", on_fallback))
+    models = [r["model"] for r in state.requests[before:]]
+    check("timeout falls back to FALLBACK_MODEL without retrying",
+          answer == ANSWER and models == ["llama4:16x17b", generator.FALLBACK_MODEL],
+          f"{models} in {time.perf_counter() - t0:.1f}s")
+    check("fallback model reported to the caller", reported == [generator.FALLBACK_MODEL], str(reported))
+
+    budget, generator.LLM_LATENCY_BUDGET_SECONDS = generator.LLM_LATENCY_BUDGET_SECONDS, 0.5
+    state.think_seconds["deepseek-r1:70b"] = 3
+    for label, run in (("async", lambda: aio.run(collect("deepseek-r1:70b"))),
+                       ("sync", lambda: generator.generate_answer("q", "ctx", model="deepseek-r1:70b"))):
+        before, t0 = len(state.requests), time.perf_counter()
+        answer = run()
+        models = [r["model"] for r in state.requests[before:]]
+        check(f"slow first token falls back after the latency budget ({label})",
+              answer == ANSWER and models == ["deepseek-r1:70b", generator.FALLBACK_MODEL]
+              and time.perf_counter() - t0 < 2, f"{models} in {time.perf_counter() - t0:.1f}s")
+    generator.LLM_LATENCY_BUDGET_SECONDS = budget
+
+    state.load_seconds["llama4:16x17b"] = 0
+    pinned = generator.pin_models()
+    with state.lock:
+        loaded = {m for m, until in state.loaded.items() if until > time.time() + 3600}
+    check("hot models from index.html pinned", set(pinned) == set(generator.hot_models()) <= loaded, str(pinned))
+
+    generator.generate_answer("q", "ctx", model="qwen2.5:72b")
+    with state.lock:
+        left = (state.loaded["qwen2.5:72b"] - time.time()) / 3600
+    check("chat turns keep a pinned model's residency", left > 23, f"{left:.1f}h left")
+
+    generator.generate_answer("q", "ctx", model="cold-model")
+    with state.lock:
+        left = (state.loaded["cold-model"] - time.time()) / 3600
+    check("other models get OLLAMA_KEEP_ALIVE", left < 1, f"{left:.1f}h left")
+
+    server.shutdown()
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline tests.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--load", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="cold-load delay for a model")
+    parser.add_argument("--fail", action="append", default=[], metavar="MODEL=N",
+                        help="answer the first N requests for a model with 503")
+    parser.add_argument("--think", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="stream empty chunks for this long before a model's first token")
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY)
+    parser.add_argument("--selftest", action="store_true", help="run the generator checks against a fake server")
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(0 if selftest() else 1)
+    pairs = lambda items, cast: {k: cast(v) for k, v in (item.rsplit("=", 1) for item in items)}
+    state = FakeOllama(pairs(args.load, float), pairs(args.fail, int), args.token_delay, pairs(args.think, float))
+    server, url = serve(state, args.port)
+    print(f"fake Ollama listening on {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()